@@ -0,0 +1,256 @@
+# benchmarks/run.py
+# Times the Database and week-loading hot paths on synthetic databases and writes the
+# results as JSON. Run from the repository root:
+#
+#   python -m benchmarks.run [--sizes 1k,100k,1m] [--output FILE] [--compare BASELINE]
+#
+# Everything here runs headless: load_week is the processing half of MainWindow.load_data and
+# the render pass drives WeekPlot on a plain Agg canvas, so no QApplication is created.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from database import DEFAULT_PROFILE, PROFILES, SCHEMA_VERSION, Database
+from schedules import materialize, parse_slot
+from weeks import load_range, load_week
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+# Synthetic schedule: six 75-minute sessions a day, every 90 minutes from 07:00
+SESSIONS_PER_DAY = 6
+LAST_DAY = date(2025, 12, 31)
+TYPES = ['Working'] * 8 + ['Vacation', 'Sick Leave']
+
+def synthetic_rows(n_entries, seed=0):
+    rng = random.Random(seed)
+    n_days = -(-n_entries // SESSIONS_PER_DAY)
+    first = LAST_DAY.toordinal() - n_days + 1
+    for i in range(n_entries):
+        day, slot = divmod(i, SESSIONS_PER_DAY)
+        check_in = 7 * 60 + slot * 90
+        entry_type = rng.choice(TYPES)
+        yield first + day, check_in, check_in + 75, entry_type, 1.25, False
+
+def build_database(path, n_entries, chunk_size=50_000):
+    # Rows are already in storage format and never overlap, so they go straight in
+    with Database(path) as db:
+        chunk = []
+        for row in synthetic_rows(n_entries):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                db.add_entries(chunk, resolve_overlaps=False)
+                chunk = []
+        if chunk:
+            db.add_entries(chunk, resolve_overlaps=False)
+
+def cached_database(data_dir, label, n_entries):
+    # Keyed by schema version so a migration never runs inside a timed benchmark
+    path = os.path.join(data_dir, f"entries_{label}_v{SCHEMA_VERSION}.db")
+    if not os.path.exists(path):
+        print(f"building {path} ({n_entries:,} entries)...", file=sys.stderr)
+        started = time.perf_counter()
+        # Built in a scratch directory, so an interrupted build and the empty archive database
+        # the build attaches are both left out of data_dir
+        with tempfile.TemporaryDirectory(dir=data_dir) as scratch:
+            partial = os.path.join(scratch, os.path.basename(path))
+            build_database(partial, n_entries)
+            os.replace(partial, path)
+        print(f"  built in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return path
+
+def entry_range(db):
+    first, last = db.conn.execute('SELECT MIN(date), MAX(date) FROM work_entries').fetchone()
+    return date.fromordinal(first), date.fromordinal(last)
+
+def measure(func, rounds, budget):
+    # Runs func up to rounds times or until budget seconds have passed, at least 3 times
+    timings = []
+    deadline = time.perf_counter() + budget
+    while len(timings) < rounds and (len(timings) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def summarize(name, size, timings):
+    ms = [t * 1000 for t in timings]
+    return {
+        'name': name,
+        'size': size,
+        'rounds': len(ms),
+        'min_ms': round(min(ms), 4),
+        'median_ms': round(statistics.median(ms), 4),
+        'mean_ms': round(statistics.fmean(ms), 4),
+        'max_ms': round(max(ms), 4),
+    }
+
+def database_benchmarks(db, rng):
+    # name -> zero-argument callable; each call picks a fresh random day/week/year
+    first, last = entry_range(db)
+    span = (last - first).days
+
+    def random_day():
+        return first + timedelta(days=rng.randrange(span + 1))
+
+    def random_monday():
+        day = random_day()
+        return max(first, day - timedelta(days=day.weekday()))
+
+    def add_entry_split():
+        # 08:00-09:00 lands inside the 07:00-08:15 and 08:30-09:45 sessions: one trim, one split
+        day = random_day()
+        db.add_entry(day.isoformat(), '08:00', '09:00', 'Working', 1.0, False)
+
+    def resolve_overlaps():
+        db.resolve_overlaps(random_day().isoformat(), '10:00', '11:30')
+
+    def get_entries_week():
+        monday = random_monday()
+        db.get_entries(monday.isoformat(), (monday + timedelta(days=6)).isoformat())
+
+    def get_entries_year():
+        year = rng.randrange(first.year, last.year + 1)
+        db.get_entries(f"{year}-01-01", f"{year}-12-31")
+
+    def load_range_decade():
+        year = rng.randrange(first.year, max(first.year, last.year - 9) + 1)
+        load_range(db, date(year, 1, 1), date(year + 9, 12, 31))
+
+    def load_week_headless():
+        load_week(db, random_monday())
+
+    db.save_template('bench', parse_slot('mon-fri=08:00-16:00') + parse_slot('sat=09:00-12:00'))
+
+    def materialize_year():
+        # ~310 entries over a full year of sessions: every one trims or removes existing rows
+        year = rng.randrange(first.year, last.year + 1)
+        materialize(db, 'bench', date(year, 1, 1), date(year, 12, 31))
+
+    return {
+        'add_entry_split': add_entry_split,
+        'resolve_overlaps': resolve_overlaps,
+        'get_entries_week': get_entries_week,
+        'get_entries_year': get_entries_year,
+        'load_range_decade': load_range_decade,
+        'load_week': load_week_headless,
+        'materialize_year': materialize_year,
+    }
+
+def render_benchmark(db, rng, n_weeks=8):
+    # Alternates between preloaded weeks so every pass rebuilds the bars and redraws
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from ui import time_scale
+    from ui.week_plot import WeekPlot
+
+    time_scale.register()
+    figure = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(figure)
+    plot = WeekPlot(figure.add_subplot())
+    first, last = entry_range(db)
+    monday = last - timedelta(days=last.weekday())
+    weeks = [load_week(db, max(first, monday - timedelta(weeks=i))) for i in range(n_weeks)]
+    plot.update(weeks[0])
+    figure.tight_layout()
+    canvas.draw()
+    counter = iter(range(1, sys.maxsize))
+
+    def render_week():
+        plot.update(weeks[next(counter) % len(weeks)])
+        canvas.draw()
+    return render_week
+
+def run(sizes, data_dir, rounds, budget, profile=DEFAULT_PROFILE, seed=0):
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    for label in sizes:
+        source = cached_database(data_dir, label, SIZES[label])
+        # The write benchmarks modify the database, so they run on a scratch copy
+        with tempfile.TemporaryDirectory() as scratch:
+            path = os.path.join(scratch, 'bench.db')
+            shutil.copyfile(source, path)
+            with Database(path, profile=profile) as db:
+                rng = random.Random(seed)
+                benchmarks = database_benchmarks(db, rng)
+                benchmarks['render_week'] = render_benchmark(db, rng)
+                for name, func in benchmarks.items():
+                    result = summarize(name, label, measure(func, rounds, budget))
+                    print(f"{label:>5} {name:<18} median {result['median_ms']:9.3f} ms "
+                          f"min {result['min_ms']:9.3f} ms ({result['rounds']} rounds)", file=sys.stderr)
+                    results.append(result)
+    return results
+
+def environment():
+    import matplotlib
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+def compare(results, baseline_path, tolerance):
+    # Regressions: benchmarks whose median grew by more than tolerance over the baseline
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get((result['name'], result['size']))
+        if before is None:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append((result, before, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description="Benchmarks for the database and week-loading hot paths")
+    parser.add_argument('--sizes', default=','.join(SIZES), help="comma-separated subset of " + ', '.join(SIZES))
+    parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'),
+                        help="where the synthetic databases are built and kept between runs")
+    parser.add_argument('--rounds', type=int, default=200, help="maximum rounds per benchmark")
+    parser.add_argument('--budget', type=float, default=2.0, help="seconds per benchmark")
+    parser.add_argument('--profile', choices=list(PROFILES), default=DEFAULT_PROFILE,
+                        help="database connection profile the benchmarks run under")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed median slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip().lower() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    results = run(sizes, args.data_dir, args.rounds, args.budget, args.profile)
+    output = args.output or os.path.join(
+        'benchmarks', 'results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'created': datetime.now().isoformat(timespec='seconds'),
+                   'environment': environment(), 'profile': args.profile, 'results': results}, f, indent=2)
+    print(f"results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for result, before, ratio in regressions:
+            print(f"REGRESSION {result['size']} {result['name']}: median {before['median_ms']:.3f} -> "
+                  f"{result['median_ms']:.3f} ms ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/time_scale.py
+# Micro-benchmark of the custom_time axis: the piecewise np.interp transform against the
+# previous three-mask implementation, on raw arrays and on full draws of a year view and a
+# busy week view. Run from the repository root:
+#
+#   python -m benchmarks.time_scale [--output FILE]
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.scale import ScaleBase
+from matplotlib.transforms import Transform
+from matplotlib import scale as mscale
+
+from ui import time_scale
+from ui.range_plot import RangePlot
+from ui.week_plot import WeekPlot
+from weeks import DayTotals, Period, RangeData, WeekData
+
+class LegacyTimeTransform(Transform):
+    # The transform before the piecewise table: three masks per call, new inverse per call
+    input_dims = output_dims = 1
+    is_separable = True
+
+    def transform_non_affine(self, t):
+        t = np.asarray(t)
+        y = np.empty_like(t)
+        mask = t < 7
+        y[mask] = t[mask] * 0.2
+        mask = (t >= 7) & (t < 18)
+        y[mask] = 7 * 0.2 + (t[mask] - 7) * 0.6
+        mask = t >= 18
+        y[mask] = 7 * 0.2 + 11 * 0.6 + (t[mask] - 18) * 0.2
+        return y
+
+    def inverted(self):
+        return LegacyInvertedTimeTransform()
+
+class LegacyInvertedTimeTransform(Transform):
+    input_dims = output_dims = 1
+    is_separable = True
+
+    def transform_non_affine(self, y):
+        y = np.asarray(y)
+        t = np.empty_like(y)
+        mask = y < 1.4
+        t[mask] = y[mask] / 0.2
+        mask = (y >= 1.4) & (y < 8.0)
+        t[mask] = 7 + (y[mask] - 1.4) / 0.6
+        mask = y >= 8.0
+        t[mask] = 18 + (y[mask] - 8.0) / 0.2
+        return t
+
+    def inverted(self):
+        return LegacyTimeTransform()
+
+class LegacyTimeScale(ScaleBase):
+    name = 'legacy_time'
+
+    def get_transform(self):
+        return LegacyTimeTransform()
+
+    def set_default_locators_and_formatters(self, axis):
+        mscale.scale_factory('custom_time', axis).set_default_locators_and_formatters(axis)
+
+def measure(func, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+def year_view():
+    rng = np.random.default_rng(0)
+    start = date(2025, 1, 1)
+    n_days = 365
+    matrix = rng.integers(0, 4, size=(96, n_days)).astype(np.int8)
+    zeros = np.zeros(n_days)
+    return RangeData('Year', start, start + timedelta(days=n_days - 1), matrix,
+                     DayTotals(start.toordinal(), zeros, zeros, zeros), 0.0)
+
+def busy_week():
+    # Forty short bars a day
+    start = date(2025, 6, 2)
+    days = [start + timedelta(days=i) for i in range(7)]
+    periods = {day.toordinal(): [Period(i, 300 + 20 * i, 315 + 20 * i, 'Working', i % 5 == 0) for i in range(40)]
+               for day in days}
+    return WeekData(start, days, periods, 0.0, 0.0)
+
+def draw_time(make_plot, data, scale, rounds):
+    figure = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    plot = make_plot(ax)
+    ax.set_yscale(scale)
+    ax.set_ylim(24, 0)
+    plot.update(data)
+    canvas.draw()
+    return measure(canvas.draw, rounds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.time_scale',
+                                     description="Benchmark of the custom_time axis transform")
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--output', help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    time_scale.register()
+    if LegacyTimeScale.name not in mscale.get_scale_names():
+        mscale.register_scale(LegacyTimeScale)
+
+    values = np.random.default_rng(1).uniform(0, 24, 1_000_000)
+    current = time_scale.CustomTimeScale(None).get_transform()
+    legacy = LegacyTimeTransform()
+    results = {
+        'transform_1m_points_ms': {
+            'legacy': measure(lambda: legacy.transform_non_affine(values), args.rounds),
+            'piecewise': measure(lambda: current.transform_non_affine(values), args.rounds),
+        },
+        'inverse_1m_points_ms': {
+            'legacy': measure(lambda: legacy.inverted().transform_non_affine(values / 3), args.rounds),
+            'piecewise': measure(lambda: current.inverted().transform_non_affine(values / 3), args.rounds),
+        },
+        'draw_year_view_ms': {
+            scale: draw_time(RangePlot, year_view(), name, args.rounds)
+            for scale, name in (('legacy', 'legacy_time'), ('piecewise', 'custom_time'))
+        },
+        'draw_busy_week_ms': {
+            scale: draw_time(WeekPlot, busy_week(), name, args.rounds)
+            for scale, name in (('legacy', 'legacy_time'), ('piecewise', 'custom_time'))
+        },
+    }
+    for name, timings in results.items():
+        print(f"{name:<24} legacy {timings['legacy']:9.3f}  piecewise {timings['piecewise']:9.3f}  "
+              f"({timings['legacy'] / timings['piecewise']:.2f}x)", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+# cli.py
+import argparse
+import json
+import logging
+import sys
+from datetime import date, datetime
+from database import DEFAULT_USER, ENTRY_TYPES, HOLIDAY, Database, format_minutes
+from importer import import_file
+from instrumentation import perf
+from report import run_report
+from schedules import WEEKDAYS, materialize, parse_slot
+from sync import DEFAULT_PORT, SyncClient, SyncError, SyncServer
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+def parse_core(value):
+    # "22-6" -> (22, 6): the hours a time_scale stretches, wrapping past midnight if end < start
+    try:
+        start, end = (int(hour) for hour in value.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid hours '{value}', expected START-END, e.g. 22-6")
+    if not (0 <= start < 24 and 0 <= end <= 24):
+        raise argparse.ArgumentTypeError(f"hours out of range in '{value}'")
+    return start, end
+
+def report(args):
+    with Database(args.db, user_id=args.user) as db:
+        if args.format == 'parquet':
+            if not args.output:
+                raise SystemExit("--output is required for parquet reports")
+            totals = run_report(db, args.from_date, args.to_date, 'parquet', path=args.output)
+        elif args.output:
+            with open(args.output, 'w', newline='', encoding='utf-8') as out:
+                totals = run_report(db, args.from_date, args.to_date, args.format, out=out)
+        else:
+            totals = run_report(db, args.from_date, args.to_date, args.format, out=sys.stdout)
+    print(json.dumps(totals), file=sys.stderr)
+
+def import_(args):
+    with Database(args.db, user_id=args.user) as db:
+        stats = import_file(db, args.file, args.format, args.chunk_size)
+    for row_number, message in stats.errors:
+        print(f"row {row_number}: {message}", file=sys.stderr)
+    print(stats.summary(), file=sys.stderr)
+    if stats.rejected and args.strict:
+        raise SystemExit(1)
+
+def sync_server(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    server = SyncServer(args.db, args.host, args.port)
+    print(f"serving {args.db} on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def sync(args):
+    with Database(args.db, user_id=args.user) as db:
+        try:
+            pushed, pulled = SyncClient(db, args.url, args.batch_size).sync()
+        except SyncError as e:
+            raise SystemExit(f"sync failed: {e}")
+    print(f"{pushed} changes pushed, {pulled} pulled", file=sys.stderr)
+
+def config(args):
+    if args.core is not None:
+        if args.key != 'time_scale' or args.value is not None:
+            raise SystemExit("--core sets time_scale and takes no value")
+        from ui.time_scale import core_hours, format_breakpoints
+        args.value = format_breakpoints(core_hours(*args.core))
+    with Database(args.db, user_id=args.user) as db:
+        if args.value is None:
+            value = db.get_setting(args.key)
+            print(value if value is not None else '')
+            return
+        if args.key == 'time_scale':
+            from ui.time_scale import parse_breakpoints
+            try:
+                parse_breakpoints(args.value)
+            except ValueError:
+                raise SystemExit("time_scale expects HOUR:SCALE pairs starting at hour 0, e.g. 0:0.2,7:0.6,18:0.2")
+        db.set_setting(args.key, args.value)
+
+def archive(args):
+    with Database(args.db, user_id=args.user) as db:
+        moved = db.archive(args.through, vacuum=args.vacuum)
+        print(f"{moved} entries archived, history closed through {db.get_archived_through()}", file=sys.stderr)
+
+def journal(args):
+    with Database(args.db, user_id=args.user) as db:
+        if args.revert is not None:
+            try:
+                db.revert_to(args.revert)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            return
+        for op in db.get_journal(args.limit):
+            print(f"{op.id}\t{datetime.fromtimestamp(op.created_at):%Y-%m-%d %H:%M:%S}\t{op.state}\t{op.rows} rows")
+
+def template(args):
+    with Database(args.db, user_id=args.user) as db:
+        if args.delete:
+            db.delete_template(args.name)
+            return
+        if not args.slots:
+            slots = db.get_template(args.name)
+            if slots is None:
+                raise SystemExit(f"no template named '{args.name}'")
+            for slot in slots:
+                print(f"{WEEKDAYS[slot.weekday]}={format_minutes(slot.check_in)}-{format_minutes(slot.check_out)}={slot.type}")
+            return
+        try:
+            db.save_template(args.name, [slot for text in args.slots for slot in parse_slot(text)])
+        except ValueError as e:
+            raise SystemExit(str(e))
+
+def days(args):
+    with Database(args.db, user_id=args.user) as db:
+        db.set_schedule_days(args.from_date, args.to_date or args.from_date, None if args.kind == 'clear' else args.kind)
+
+def materialize_(args):
+    with Database(args.db, user_id=args.user) as db:
+        try:
+            written = materialize(db, args.name, args.from_date, args.to_date)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    print(f"{written} entries written", file=sys.stderr)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='hours', description="Work hours tracker without the GUI")
+    parser.add_argument('--db', default='data/work_hours.db', help="database file")
+    parser.add_argument('--user', default=DEFAULT_USER, help="user whose hours are read or written")
+    parser.add_argument('--perf', action='store_true', help="log timing spans and SQL statements to stderr")
+    parser.add_argument('--perf-stats', metavar='FILE', help="rolling file of timing records, one JSON line each")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = commands.add_parser('report', help="export entries and totals for a date range")
+    report_parser.add_argument('--from', dest='from_date', type=parse_date, required=True)
+    report_parser.add_argument('--to', dest='to_date', type=parse_date, default=date.today())
+    report_parser.add_argument('--format', choices=['csv', 'json', 'parquet'], default='csv')
+    report_parser.add_argument('--output', help="output file (required for parquet, stdout otherwise)")
+    report_parser.set_defaults(func=report)
+
+    import_parser = commands.add_parser('import', help="bulk-load entries from CSV or JSON")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--format', choices=['csv', 'json'], help="default: from the file extension")
+    import_parser.add_argument('--chunk-size', type=int, default=5000, help="entries per transaction")
+    import_parser.add_argument('--strict', action='store_true', help="exit non-zero if any row was rejected")
+    import_parser.set_defaults(func=import_)
+
+    server_parser = commands.add_parser('sync-server', help="serve the database to sync clients")
+    server_parser.add_argument('--host', default='127.0.0.1')
+    server_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    server_parser.set_defaults(func=sync_server)
+
+    sync_parser = commands.add_parser('sync', help="exchange changes with a sync server")
+    sync_parser.add_argument('url', help=f"e.g. http://127.0.0.1:{DEFAULT_PORT}")
+    sync_parser.add_argument('--batch-size', type=int, default=500, help="changes per request")
+    sync_parser.set_defaults(func=sync)
+
+    archive_parser = commands.add_parser('archive', help="move closed periods to the read-only archive")
+    archive_parser.add_argument('--through', type=parse_date, required=True, help="last day to archive")
+    archive_parser.add_argument('--vacuum', action='store_true', help="compact both database files afterwards")
+    archive_parser.set_defaults(func=archive)
+
+    journal_parser = commands.add_parser('journal', help="list recent write operations, or revert to one")
+    journal_parser.add_argument('--limit', type=int, default=20, help="operations to list, newest first")
+    journal_parser.add_argument('--revert', type=int, metavar='OP',
+                                help="undo or redo operations until OP is the latest; 0 for before the first")
+    journal_parser.set_defaults(func=journal)
+
+    template_parser = commands.add_parser('template', help="show, define or delete a weekly schedule template")
+    template_parser.add_argument('name')
+    template_parser.add_argument('slots', nargs='*', metavar='SLOT',
+                                 help="DAYS=HH:MM-HH:MM[=TYPE], e.g. mon-fri=08:00-16:00; replaces the template")
+    template_parser.add_argument('--delete', action='store_true')
+    template_parser.set_defaults(func=template)
+
+    days_parser = commands.add_parser('days', help="mark holidays or leave blocks for templates to honour")
+    days_parser.add_argument('kind', choices=[HOLIDAY, *ENTRY_TYPES[1:], 'clear'])
+    days_parser.add_argument('--from', dest='from_date', type=parse_date, required=True)
+    days_parser.add_argument('--to', dest='to_date', type=parse_date, help="default: the --from day only")
+    days_parser.set_defaults(func=days)
+
+    materialize_parser = commands.add_parser('materialize', help="write a template's entries over a date range")
+    materialize_parser.add_argument('name')
+    materialize_parser.add_argument('--from', dest='from_date', type=parse_date, required=True)
+    materialize_parser.add_argument('--to', dest='to_date', type=parse_date, required=True)
+    materialize_parser.set_defaults(func=materialize_)
+
+    config_parser = commands.add_parser('config', help="show or change a setting, e.g. time_scale")
+    config_parser.add_argument('key')
+    config_parser.add_argument('value', nargs='?')
+    config_parser.add_argument('--core', type=parse_core, metavar='START-END',
+                               help="time_scale stretching these hours and compressing the rest, e.g. 22-6")
+    config_parser.set_defaults(func=config)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.perf or args.perf_stats:
+        if args.perf:
+            logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
+            logging.getLogger('hours.perf').setLevel(logging.DEBUG)
+            logging.getLogger('hours.sql').setLevel(logging.DEBUG)
+        perf.enable(stats_path=args.perf_stats)
+    try:
+        args.func(args)
+    finally:
+        if perf.enabled:
+            print(perf.summary(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
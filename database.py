@@ -1,135 +1,1324 @@
 # database.py
+import json
+import math
+import os
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime
+from instrumentation import perf
+from intervals import DayIntervals
+
+SCHEMA_VERSION = 7
+
+# Version of the attached archive database's own schema
+ARCHIVE_SCHEMA_VERSION = 1
+
+# Hours per day beyond which time counts as overtime
+DAILY_NORM_HOURS = 7.5
+
+# Connection settings applied on open, by profile name. 'performance' keeps the last commits
+# only in the WAL until a checkpoint (synchronous=NORMAL), so a power loss can drop them but
+# never corrupts the file; 'safe' is SQLite's stock rollback journal with a sync per commit.
+PROFILES = {
+    'safe': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+    },
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32768,  # Negative means KiB: 32 MiB of page cache
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+DEFAULT_PROFILE = 'performance'
+
+# Seconds a connection waits for another connection's write lock before giving up
+BUSY_TIMEOUT = 30.0
+
+# Owner of the rows of databases created before entries had a user_id, and of the desktop app's
+DEFAULT_USER = 'default'
+
+# Prepared statements kept per connection; the fixed SQL of this module fits easily
+STATEMENT_CACHE_SIZE = 256
+
+ENTRY_TYPES = ("Working", "Sick Leave", "Vacation")
+
+def default_lunch_break(entry_type, hours):
+    # Working sessions over 5 hours automatically include a lunch break
+    return entry_type == "Working" and hours > 5
+
+# Rebuilds the daily_totals row of one user's day from work_entries; {row} is NEW or OLD
+_RECOMPUTE_DAY = f'''
+    DELETE FROM daily_totals WHERE user_id = {{row}}.user_id AND date = {{row}}.date;
+    INSERT INTO daily_totals (user_id, date, worked_hours, leave_hours, overtime_hours)
+    SELECT user_id, date,
+           TOTAL(CASE WHEN type = 'Working' THEN hours END),
+           TOTAL(CASE WHEN type != 'Working' THEN hours END),
+           MAX(TOTAL(hours) - {DAILY_NORM_HOURS}, 0)
+    FROM work_entries WHERE user_id = {{row}}.user_id AND date = {{row}}.date
+    GROUP BY user_id, date;
+'''
+
+_TOTALS_TRIGGERS = ('work_entries_totals_insert', 'work_entries_totals_delete', 'work_entries_totals_update')
+
+# Appends the latest change of one row to change_log for replication; {row} is NEW or OLD.
+# Skipped while a sync_state 'applying' row exists, i.e. while replicated changes are written;
+# a sync_state 'origin' row names the sync client a server is applying changes from.
+# (An explicit DELETE rather than INSERT OR REPLACE: the conflict clause of the statement that
+# fired the trigger, such as an upsert, would override the REPLACE.)
+_LOG_CHANGE = '''
+    DELETE FROM change_log WHERE uid = {row}.uid;
+    INSERT INTO change_log (uid, user_id, origin)
+    VALUES ({row}.uid, {row}.user_id, (SELECT value FROM sync_state WHERE key = 'origin'));
+'''
+_UNLESS_APPLYING = "WHEN NOT EXISTS (SELECT 1 FROM sync_state WHERE key = 'applying')"
+
+# Column order of replicated rows: the storage-format row plus the replication id
+SYNC_COLUMNS = ('uid', 'date', 'check_in', 'check_out', 'type', 'hours', 'lunch_break')
+
+# journal_ops.state by value. An undone operation is on the redo stack until a new operation
+# is recorded; then it is discarded, but stays in the journal as a record of what happened.
+# journal_rows.before/after hold (date, check_in, check_out, type, hours, lunch_break) as JSON.
+JOURNAL_STATES = ('done', 'undone', 'discarded')
+_OP_DONE, _OP_UNDONE, _OP_DISCARDED = range(3)
+
+JournalOp = namedtuple('JournalOp', ['id', 'created_at', 'state', 'rows'])
+
+# One recurring bar of a schedule template: weekday 0 is Monday, times are minutes
+ScheduleSlot = namedtuple('ScheduleSlot', ['weekday', 'check_in', 'check_out', 'type', 'lunch_break'])
+
+# schedule_days.kind of a day without work; the other kinds are leave types from ENTRY_TYPES
+HOLIDAY = 'Holiday'
+
+# Last archived day of the user bound to the same parameter as the hot tier's user_id; the hot
+# tier is only read after it, so rows left behind by an interrupted archive() never show twice
+_AFTER_ARCHIVED = "date > COALESCE((SELECT through FROM archive.archive_state WHERE user_id = ?), 0)"
+
+def default_archive_path(db_path):
+    # data/work_hours.db -> data/work_hours.archive.db
+    if db_path == ':memory:':
+        return db_path
+    return os.path.splitext(db_path)[0] + '.archive.db'
+
+def to_ordinal(value):
+    # Dates are stored as proleptic Gregorian ordinals (date.toordinal())
+    if isinstance(value, int):
+        return value
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(value).toordinal()
+
+def to_minutes(value):
+    # Times are stored as minutes since midnight
+    if value is None or isinstance(value, int):
+        return value
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def validate_entry(check_in, check_out, hours):
+    # Raises ValueError unless the times (minutes, None for untimed entries) and hours can be
+    # stored: check-out after check-in and at 24:00, the midnight ending the day, at the latest
+    if check_in is not None and check_out is not None and not 0 <= check_in < check_out <= 24 * 60:
+        raise ValueError(f"Invalid times {format_minutes(check_in)}-{format_minutes(check_out)}: "
+                         "check-out must be after check-in and no later than 24:00")
+    if hours is not None and not (math.isfinite(hours) and hours >= 0):
+        raise ValueError(f"Hours must be a non-negative number, not {hours:g}")
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def validate_sync_row(row):
+    # Raises ValueError unless a replicated row, in SYNC_COLUMNS order, is in storage format and
+    # passes validate_entry; check_out alone may be None, for a running clock-in
+    uid, entry_date, check_in, check_out, entry_type, hours, lunch_break = row
+    if not (isinstance(uid, str) and uid
+            and _is_int(entry_date) and 1 <= entry_date <= date.max.toordinal()
+            and _is_int(check_in) == (check_in is not None)
+            and _is_int(check_out) == (check_out is not None)
+            and not (check_in is None and check_out is not None)
+            and entry_type in ENTRY_TYPES
+            and isinstance(hours, (int, float)) and not isinstance(hours, bool)
+            and lunch_break in (0, 1)):
+        raise ValueError(f"Invalid replicated row {row!r}")
+    validate_entry(check_in, check_out, hours)
+
+ENTRY_COLUMNS = 'id, date, check_in, check_out, type, hours, lunch_break'
+
+class Entry(namedtuple('Entry', ['id', 'date', 'check_in', 'check_out', 'type', 'hours', 'lunch_break'])):
+    # A work_entries row in storage format: date is a day ordinal, check_in/check_out are minutes
+    __slots__ = ()
+
+    @property
+    def day(self):
+        return date.fromordinal(self.date)
+
+def _entry_factory(cursor, row):
+    return Entry._make(row)
 
 class Database:
-    def __init__(self, db_path='data/work_hours.db'):
-        self.conn = sqlite3.connect(db_path)
+    # One connection acting for one user: every read and write is scoped to user_id
+    def __init__(self, db_path='data/work_hours.db', check_same_thread=True, profile=DEFAULT_PROFILE,
+                 user_id=DEFAULT_USER, timeout=BUSY_TIMEOUT, archive_path=None):
+        self.db_path = db_path
+        self.archive_path = archive_path or default_archive_path(db_path)
+        self.profile = profile
+        self.user_id = user_id
+        # timeout installs SQLite's busy handler, so lock contention waits instead of failing
+        self.conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, timeout=timeout,
+                                    cached_statements=STATEMENT_CACHE_SIZE)
+        if perf.enabled:
+            perf.attach(self)
+        # Attached before the profile is applied, so its journal_mode covers the archive too
+        self.conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        self.apply_profile(profile)
+        self._transaction_depth = 0
+        self._listeners = []
+        self._changed_dates = set()
+        self._journal_op = None  # journal_ops id of the open transaction, once it wrote entries
+        self._journal_seq = 0
         self.create_tables()
 
+    def apply_profile(self, profile):
+        try:
+            settings = PROFILES[profile]
+        except KeyError:
+            raise ValueError(f"Unknown database profile: {profile}")
+        for name, value in settings.items():
+            self.conn.execute(f'PRAGMA {name} = {value}')
+
+    def add_listener(self, callback):
+        # callback(dates) runs after each commit that changed work_entries on those day ordinals
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def _mark_changed(self, dates):
+        if self._listeners:
+            self._changed_dates.update(dates)
+
+    @contextmanager
+    def transaction(self):
+        # Nested transactions join the outermost one, which commits once. Transactions are for
+        # writes, so the write lock is taken up front: a deferred transaction that reads first and
+        # then upgrades fails with SQLITE_BUSY immediately instead of waiting on the busy handler.
+        if self._transaction_depth == 0:
+            self.conn.execute('BEGIN IMMEDIATE')
+        self._transaction_depth += 1
+        try:
+            yield self.conn.cursor()
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+                self._changed_dates.clear()
+                self._journal_op = None
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self._journal_op = None
+            self.conn.commit()
+            if self._changed_dates:
+                changed, self._changed_dates = self._changed_dates, set()
+                for callback in list(self._listeners):
+                    callback(changed)
+
     def create_tables(self):
+        self._create_archive_tables()
+        cursor = self.conn.cursor()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Another connection may have migrated while this one waited for the lock
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1:
+                self._migrate_to_v1(cursor)
+            if version < 2:
+                self._migrate_to_v2(cursor)
+            if version < 3:
+                self._migrate_to_v3(cursor)
+            if version < 4:
+                self._migrate_to_v4(cursor)
+            if version < 5:
+                self._migrate_to_v5(cursor)
+            if version < 6:
+                self._migrate_to_v6(cursor)
+            if version < 7:
+                self._migrate_to_v7(cursor)
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _create_archive_tables(self):
+        # The archive tier: entries and daily totals of closed periods, moved there by archive().
+        # Rows are written in (user_id, date, check_in) order and never updated, so the table
+        # stays physically sorted and VACUUM leaves it densely packed.
         cursor = self.conn.cursor()
+        if cursor.execute('PRAGMA archive.user_version').fetchone()[0] >= ARCHIVE_SCHEMA_VERSION:
+            return
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if cursor.execute('PRAGMA archive.user_version').fetchone()[0] < 1:
+                cursor.execute('''
+                    CREATE TABLE archive.entries (
+                        id INTEGER PRIMARY KEY,
+                        user_id TEXT NOT NULL,
+                        uid TEXT NOT NULL,
+                        date INTEGER NOT NULL,
+                        check_in INTEGER,
+                        check_out INTEGER,
+                        type TEXT NOT NULL,
+                        hours REAL NOT NULL,
+                        lunch_break BOOLEAN NOT NULL
+                    )
+                ''')
+                cursor.execute('CREATE INDEX archive.idx_entries_user_date_check_in ON entries (user_id, date, check_in)')
+                cursor.execute('CREATE UNIQUE INDEX archive.idx_entries_uid ON entries (uid)')
+                cursor.execute('''
+                    CREATE TABLE archive.daily_totals (
+                        user_id TEXT NOT NULL,
+                        date INTEGER NOT NULL,
+                        worked_hours REAL NOT NULL,
+                        leave_hours REAL NOT NULL,
+                        overtime_hours REAL NOT NULL,
+                        PRIMARY KEY (user_id, date)
+                    ) WITHOUT ROWID
+                ''')
+                # Per user, the last archived day; earlier days are read from the archive only
+                cursor.execute('''
+                    CREATE TABLE archive.archive_state (
+                        user_id TEXT PRIMARY KEY,
+                        through INTEGER NOT NULL
+                    )
+                ''')
+            cursor.execute(f'PRAGMA archive.user_version = {ARCHIVE_SCHEMA_VERSION}')
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _migrate_to_v1(self, cursor):
+        # v0 stored date/check_in/check_out as 'YYYY-MM-DD' / 'HH:MM' text
+        legacy = cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'work_entries'
+        """).fetchone()
+        if legacy:
+            cursor.execute('ALTER TABLE work_entries RENAME TO work_entries_v0')
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS work_entries (
+            CREATE TABLE work_entries (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                check_in TEXT,
-                check_out TEXT,
+                date INTEGER NOT NULL,
+                check_in INTEGER,
+                check_out INTEGER,
                 type TEXT NOT NULL,
                 hours REAL NOT NULL,
                 lunch_break BOOLEAN NOT NULL DEFAULT 1
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX idx_work_entries_date_check_in
+            ON work_entries (date, check_in)
+        ''')
+        if legacy:
+            rows = self.conn.execute('''
+                SELECT id, date, check_in, check_out, type, hours, lunch_break
+                FROM work_entries_v0
+            ''')
+            cursor.executemany('''
+                INSERT INTO work_entries (id, date, check_in, check_out, type, hours, lunch_break)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', ((entry_id, to_ordinal(entry_date), to_minutes(check_in), to_minutes(check_out),
+                   entry_type, hours, lunch_break)
+                  for entry_id, entry_date, check_in, check_out, entry_type, hours, lunch_break in rows))
+            cursor.execute('DROP TABLE work_entries_v0')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS settings (
                 key TEXT PRIMARY KEY,
                 value TEXT
             )
         ''')
-        self.conn.commit()
+
+    def _migrate_to_v2(self, cursor):
+        # Per-day aggregates kept up to date by triggers, so balances never scan work_entries.
+        # v3 re-keys them by user; this is the single-user shape they had in v2.
+        recompute_day = f'''
+            DELETE FROM daily_totals WHERE date = {{day}};
+            INSERT INTO daily_totals (date, worked_hours, leave_hours, overtime_hours)
+            SELECT date,
+                   TOTAL(CASE WHEN type = 'Working' THEN hours END),
+                   TOTAL(CASE WHEN type != 'Working' THEN hours END),
+                   MAX(TOTAL(hours) - {DAILY_NORM_HOURS}, 0)
+            FROM work_entries WHERE date = {{day}}
+            GROUP BY date;
+        '''
+        cursor.execute('''
+            CREATE TABLE daily_totals (
+                date INTEGER PRIMARY KEY,
+                worked_hours REAL NOT NULL,
+                leave_hours REAL NOT NULL,
+                overtime_hours REAL NOT NULL
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_insert AFTER INSERT ON work_entries
+            BEGIN {recompute_day.format(day='NEW.date')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_delete AFTER DELETE ON work_entries
+            BEGIN {recompute_day.format(day='OLD.date')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_update AFTER UPDATE ON work_entries
+            BEGIN
+                {recompute_day.format(day='OLD.date')}
+                {recompute_day.format(day='NEW.date')}
+            END
+        ''')
+        cursor.execute(f'''
+            INSERT INTO daily_totals (date, worked_hours, leave_hours, overtime_hours)
+            SELECT date,
+                   TOTAL(CASE WHEN type = 'Working' THEN hours END),
+                   TOTAL(CASE WHEN type != 'Working' THEN hours END),
+                   MAX(TOTAL(hours) - {DAILY_NORM_HOURS}, 0)
+            FROM work_entries
+            GROUP BY date
+        ''')
+
+    def _migrate_to_v3(self, cursor):
+        # Rows gain an owner; everything recorded so far belongs to DEFAULT_USER
+        cursor.execute(f"ALTER TABLE work_entries ADD COLUMN user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER}'")
+        cursor.execute('DROP INDEX idx_work_entries_date_check_in')
+        cursor.execute('''
+            CREATE INDEX idx_work_entries_user_date_check_in
+            ON work_entries (user_id, date, check_in)
+        ''')
+
+        cursor.execute('ALTER TABLE settings RENAME TO settings_v2')
+        cursor.execute('''
+            CREATE TABLE settings (
+                user_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (user_id, key)
+            )
+        ''')
+        cursor.execute('INSERT INTO settings (user_id, key, value) SELECT ?, key, value FROM settings_v2',
+                       (DEFAULT_USER,))
+        cursor.execute('DROP TABLE settings_v2')
+
+        for trigger in _TOTALS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER {trigger}')
+        cursor.execute('DROP TABLE daily_totals')
+        # Clustered on (user_id, date), so a balance is one contiguous range scan
+        cursor.execute('''
+            CREATE TABLE daily_totals (
+                user_id TEXT NOT NULL,
+                date INTEGER NOT NULL,
+                worked_hours REAL NOT NULL,
+                leave_hours REAL NOT NULL,
+                overtime_hours REAL NOT NULL,
+                PRIMARY KEY (user_id, date)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_insert AFTER INSERT ON work_entries
+            BEGIN {_RECOMPUTE_DAY.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_delete AFTER DELETE ON work_entries
+            BEGIN {_RECOMPUTE_DAY.format(row='OLD')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_update AFTER UPDATE ON work_entries
+            BEGIN
+                {_RECOMPUTE_DAY.format(row='OLD')}
+                {_RECOMPUTE_DAY.format(row='NEW')}
+            END
+        ''')
+        cursor.execute(f'''
+            INSERT INTO daily_totals (user_id, date, worked_hours, leave_hours, overtime_hours)
+            SELECT user_id, date,
+                   TOTAL(CASE WHEN type = 'Working' THEN hours END),
+                   TOTAL(CASE WHEN type != 'Working' THEN hours END),
+                   MAX(TOTAL(hours) - {DAILY_NORM_HOURS}, 0)
+            FROM work_entries
+            GROUP BY user_id, date
+        ''')
+
+    def _migrate_to_v4(self, cursor):
+        # Replication: every row gets a uid that is the same on all machines, and change_log
+        # keeps the version of the latest change of each uid
+        cursor.execute('DROP TRIGGER work_entries_totals_update')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_totals_update AFTER UPDATE OF user_id, date, type, hours ON work_entries
+            BEGIN
+                {_RECOMPUTE_DAY.format(row='OLD')}
+                {_RECOMPUTE_DAY.format(row='NEW')}
+            END
+        ''')
+        cursor.execute('ALTER TABLE work_entries ADD COLUMN uid TEXT')
+        cursor.execute('UPDATE work_entries SET uid = lower(hex(randomblob(16)))')
+        cursor.execute('CREATE UNIQUE INDEX idx_work_entries_uid ON work_entries (uid)')
+
+        cursor.execute('''
+            CREATE TABLE change_log (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL UNIQUE,
+                user_id TEXT NOT NULL,
+                origin TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX idx_change_log_user_version ON change_log (user_id, version)')
+        cursor.execute('''
+            CREATE TABLE sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        # Everything recorded so far counts as changed, so the first sync sends it all
+        cursor.execute('''
+            INSERT INTO change_log (uid, user_id)
+            SELECT uid, user_id FROM work_entries ORDER BY user_id, date, check_in
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_log_insert AFTER INSERT ON work_entries {_UNLESS_APPLYING}
+            BEGIN {_LOG_CHANGE.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_log_update AFTER UPDATE ON work_entries {_UNLESS_APPLYING}
+            BEGIN {_LOG_CHANGE.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER work_entries_log_delete AFTER DELETE ON work_entries {_UNLESS_APPLYING}
+            BEGIN {_LOG_CHANGE.format(row='OLD')} END
+        ''')
+
+    def _migrate_to_v5(self, cursor):
+        # Undo journal: one journal_ops row per write transaction, and per row it touched the
+        # before and after state (NULL before an insert and after a delete), keyed by uid
+        cursor.execute('''
+            CREATE TABLE journal_ops (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('CREATE INDEX idx_journal_ops_user_state ON journal_ops (user_id, state, id)')
+        cursor.execute('''
+            CREATE TABLE journal_rows (
+                op_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                uid TEXT NOT NULL,
+                before TEXT,
+                after TEXT,
+                PRIMARY KEY (op_id, seq)
+            ) WITHOUT ROWID
+        ''')
+
+    def _migrate_to_v6(self, cursor):
+        # Schedule templates: named weekly patterns per user, plus the user's days that break
+        # the pattern (holidays, vacation blocks)
+        cursor.execute('''
+            CREATE TABLE schedule_templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                UNIQUE (user_id, name)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE schedule_slots (
+                template_id INTEGER NOT NULL,
+                weekday INTEGER NOT NULL,
+                check_in INTEGER NOT NULL,
+                check_out INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                lunch_break BOOLEAN NOT NULL,
+                PRIMARY KEY (template_id, weekday, check_in)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE schedule_days (
+                user_id TEXT NOT NULL,
+                date INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                PRIMARY KEY (user_id, date)
+            ) WITHOUT ROWID
+        ''')
+
+    def _migrate_to_v7(self, cursor):
+        # Live clock-in: at most a handful of rows are ever open, so this index stays tiny
+        cursor.execute('''
+            CREATE INDEX idx_work_entries_open ON work_entries (user_id, date, check_in)
+            WHERE check_in IS NOT NULL AND check_out IS NULL
+        ''')
 
     def add_entry(self, date, check_in, check_out, entry_type, hours, lunch_break):
-        self.resolve_overlaps(date, check_in, check_out)
+        self.add_entries([(date, check_in, check_out, entry_type, hours, lunch_break)])
+
+    def add_entries(self, entries, resolve_overlaps=True):
+        # entries: iterable of (date, check_in, check_out, entry_type, hours, lunch_break).
+        # Later entries override earlier ones, exactly as successive add_entry calls would.
+        rows = [(to_ordinal(entry_date), to_minutes(check_in), to_minutes(check_out), entry_type, hours, lunch_break)
+                for entry_date, check_in, check_out, entry_type, hours, lunch_break in entries]
+        for row in rows:
+            validate_entry(row[1], row[2], row[4])
+        with self.transaction():
+            if not resolve_overlaps:
+                self.apply_changes(('insert', row) for row in rows)
+                return
+            timed = [row for row in rows if row[1] is not None and row[2] is not None]
+            days = self._load_days({row[0] for row in timed})
+            for entry_date, check_in, check_out, entry_type, hours, lunch_break in timed:
+                days[entry_date].insert(check_in, check_out, entry_type, hours, lunch_break)
+            changes = [('insert', row) for row in rows if row[1] is None or row[2] is None]
+            for day in days.values():
+                changes.extend(day.changes())
+            self.apply_changes(changes)
+
+    def _load_days(self, dates):
+        # One range scan over the (date, check_in) index for all requested days
+        days = {entry_date: DayIntervals(entry_date) for entry_date in dates}
+        if not days:
+            return days
         cursor = self.conn.cursor()
         cursor.execute('''
-            INSERT INTO work_entries (date, check_in, check_out, type, hours, lunch_break)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (date, check_in, check_out, entry_type, hours, lunch_break))
-        self.conn.commit()
+            SELECT date, id, check_in, check_out, type, hours, lunch_break FROM work_entries
+            WHERE user_id = ? AND date BETWEEN ? AND ? AND check_in IS NOT NULL AND check_out IS NOT NULL
+            ORDER BY date, check_in
+        ''', (self.user_id, min(days), max(days)))
+        rows = {}
+        for entry_date, *interval in cursor:
+            if entry_date in days:
+                rows.setdefault(entry_date, []).append(interval)
+        for entry_date, intervals in rows.items():
+            days[entry_date] = DayIntervals(entry_date, intervals)
+        return days
 
-    def get_entries(self, start_date, end_date):
+    def apply_changes(self, batch):
+        # batch: iterable of ('insert', row), ('update', entry_id, row) or ('delete', entry_id),
+        # where row is (date, check_in, check_out, entry_type, hours, lunch_break) in storage format
+        # Rows are written for this connection's user; ids of other users' rows are ignored.
+        # Every change is journaled, see undo().
+        inserts, updates, deletes = [], [], []
+        for change in batch:
+            if change[0] == 'insert':
+                inserts.append((*change[1], self.user_id, uuid.uuid4().hex))
+            elif change[0] == 'update':
+                updates.append((*change[2], change[1], self.user_id))
+            elif change[0] == 'delete':
+                deletes.append((change[1], self.user_id))
+            else:
+                raise ValueError(f"Unknown change type: {change[0]}")
+        with self.transaction() as cursor:
+            # The rows about to be updated or deleted: the journal's before states, and the days
+            # they are leaving for the listeners
+            before = {}
+            entry_ids = [update[-2] for update in updates] + [delete[0] for delete in deletes]
+            for i in range(0, len(entry_ids), 500):
+                chunk = entry_ids[i:i + 500]
+                cursor.execute(f"""
+                    SELECT id, uid, date, check_in, check_out, type, hours, lunch_break FROM work_entries
+                    WHERE user_id = ? AND id IN ({','.join('?' * len(chunk))})
+                """, (self.user_id, *chunk))
+                for entry_id, *row in cursor.fetchall():
+                    before[entry_id] = row
+            self._check_not_archived(cursor, [row[0] for row in inserts + updates],
+                                     [entry_id for entry_id in entry_ids if entry_id not in before])
+            if self._listeners:
+                self._mark_changed(row[0] for row in inserts + updates)
+                self._mark_changed(row[1] for row in before.values())
+            cursor.executemany('DELETE FROM work_entries WHERE id = ? AND user_id = ?', deletes)
+            cursor.executemany('''
+                UPDATE work_entries
+                SET date = ?, check_in = ?, check_out = ?, type = ?, hours = ?, lunch_break = ?
+                WHERE id = ? AND user_id = ?
+            ''', updates)
+            cursor.executemany('''
+                INSERT INTO work_entries (date, check_in, check_out, type, hours, lunch_break, user_id, uid)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', inserts)
+            diffs = [(before[delete[0]][0], before[delete[0]][1:], None)
+                     for delete in deletes if delete[0] in before]
+            diffs.extend((before[update[-2]][0], before[update[-2]][1:], update[:6])
+                         for update in updates if update[-2] in before)
+            diffs.extend((insert[-1], None, insert[:6]) for insert in inserts)
+            self._journal(cursor, diffs)
+
+    def _check_not_archived(self, cursor, dates, missing_ids):
+        # Archived history is read-only: no writes on archived days or to archived rows
+        through = cursor.execute('SELECT through FROM archive.archive_state WHERE user_id = ?',
+                                 (self.user_id,)).fetchone()
+        if through is None:
+            return
+        if dates and min(dates) <= through[0]:
+            raise ValueError(f"Entries up to {date.fromordinal(through[0])} are archived and cannot be changed")
+        for i in range(0, len(missing_ids), 500):
+            chunk = missing_ids[i:i + 500]
+            cursor.execute(f"""
+                SELECT 1 FROM archive.entries WHERE user_id = ? AND id IN ({','.join('?' * len(chunk))}) LIMIT 1
+            """, (self.user_id, *chunk))
+            if cursor.fetchone():
+                raise ValueError(f"Entries up to {date.fromordinal(through[0])} are archived and cannot be changed")
+
+    def _journal(self, cursor, diffs):
+        # Appends (uid, before, after) row states to the open transaction's operation
+        if not diffs:
+            return
+        if self._journal_op is None:
+            # A new operation ends the redo history
+            cursor.execute('UPDATE journal_ops SET state = ? WHERE user_id = ? AND state = ?',
+                           (_OP_DISCARDED, self.user_id, _OP_UNDONE))
+            cursor.execute('INSERT INTO journal_ops (user_id, created_at, state) VALUES (?, ?, ?)',
+                           (self.user_id, time.time(), _OP_DONE))
+            self._journal_op, self._journal_seq = cursor.lastrowid, 0
+        encode = json.JSONEncoder(separators=(',', ':')).encode
+        rows = []
+        for uid, before, after in diffs:
+            rows.append((self._journal_op, self._journal_seq, uid,
+                         None if before is None else encode(list(before)),
+                         None if after is None else encode(list(after))))
+            self._journal_seq += 1
+        cursor.executemany('INSERT INTO journal_rows (op_id, seq, uid, before, after) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def _replay(self, cursor, op_id, undo):
+        # Writes one operation's before states (undo) or after states (redo) back by uid.
+        # Undo walks the rows backwards, so a row touched twice in one operation ends up in
+        # its first before state.
+        rows = cursor.execute(f'''
+            SELECT uid, before, after FROM journal_rows WHERE op_id = ?
+            ORDER BY seq {'DESC' if undo else 'ASC'}
+        ''', (op_id,)).fetchall()
+        for uid, before, after in rows:
+            source, target = (after, before) if undo else (before, after)
+            if self._listeners:
+                self._mark_changed(json.loads(state)[0] for state in (source, target) if state is not None)
+            if target is None:
+                cursor.execute('DELETE FROM work_entries WHERE uid = ? AND user_id = ?', (uid, self.user_id))
+                continue
+            target = json.loads(target)
+            # An upsert also restores a row deleted after the operation, e.g. by a replicated change
+            cursor.execute('''
+                INSERT INTO work_entries (uid, date, check_in, check_out, type, hours, lunch_break, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (uid) DO UPDATE SET
+                    date = excluded.date, check_in = excluded.check_in, check_out = excluded.check_out,
+                    type = excluded.type, hours = excluded.hours, lunch_break = excluded.lunch_break
+                WHERE user_id = excluded.user_id
+            ''', (uid, *target, self.user_id))
+
+    def _step(self, undo):
+        state, new_state, order = (_OP_DONE, _OP_UNDONE, 'DESC') if undo else (_OP_UNDONE, _OP_DONE, 'ASC')
+        with self.transaction() as cursor:
+            row = cursor.execute(f'''
+                SELECT id FROM journal_ops WHERE user_id = ? AND state = ? ORDER BY id {order} LIMIT 1
+            ''', (self.user_id, state)).fetchone()
+            if row is None:
+                return None
+            self._replay(cursor, row[0], undo)
+            cursor.execute('UPDATE journal_ops SET state = ? WHERE id = ?', (new_state, row[0]))
+            return row[0]
+
+    def undo(self):
+        # Reverts this user's latest done operation, i.e. the entries written by one transaction
+        # (an add, an edit with the overlaps it resolved, an import chunk, ...). Returns its id,
+        # or None when there is nothing to undo. Rows are restored by uid, so undo is replicated
+        # like any other edit.
+        return self._step(undo=True)
+
+    def redo(self):
+        # Re-applies the operation undone last; returns its id or None
+        return self._step(undo=False)
+
+    def can_undo(self):
+        return self._has_op(_OP_DONE)
+
+    def can_redo(self):
+        return self._has_op(_OP_UNDONE)
+
+    def _has_op(self, state):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT 1 FROM journal_ops WHERE user_id = ? AND state = ? LIMIT 1', (self.user_id, state))
+        return cursor.fetchone() is not None
+
+    def revert_to(self, op_id):
+        # Brings this user's entries to their state right after operation op_id (0: before the
+        # first one), undoing later operations and redoing undone ones up to it. Discarded
+        # operations are off the current history and cannot be reverted to.
+        with self.transaction() as cursor:
+            target = cursor.execute('SELECT state FROM journal_ops WHERE id = ? AND user_id = ?',
+                                    (op_id, self.user_id)).fetchone()
+            if op_id and (target is None or target[0] == _OP_DISCARDED):
+                raise ValueError(f"No journal operation {op_id} in the current history")
+            while True:
+                current = cursor.execute('''
+                    SELECT MAX(id) FROM journal_ops WHERE user_id = ? AND state = ? AND id > ?
+                ''', (self.user_id, _OP_DONE, op_id)).fetchone()[0]
+                if current is None:
+                    break
+                self._replay(cursor, current, undo=True)
+                cursor.execute('UPDATE journal_ops SET state = ? WHERE id = ?', (_OP_UNDONE, current))
+            while True:
+                following = cursor.execute('''
+                    SELECT MIN(id) FROM journal_ops WHERE user_id = ? AND state = ? AND id <= ?
+                ''', (self.user_id, _OP_UNDONE, op_id)).fetchone()[0]
+                if following is None:
+                    break
+                self._replay(cursor, following, undo=False)
+                cursor.execute('UPDATE journal_ops SET state = ? WHERE id = ?', (_OP_DONE, following))
+
+    def get_journal(self, limit=100):
+        # This user's latest operations, newest first, as JournalOp records
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT * FROM work_entries
-            WHERE date BETWEEN ? AND ?
-        ''', (start_date, end_date))
+            SELECT o.id, o.created_at, o.state, (SELECT COUNT(*) FROM journal_rows r WHERE r.op_id = o.id)
+            FROM journal_ops o WHERE o.user_id = ?
+            ORDER BY o.id DESC LIMIT ?
+        ''', (self.user_id, limit))
+        return [JournalOp(op_id, created_at, JOURNAL_STATES[state], rows)
+                for op_id, created_at, state, rows in cursor.fetchall()]
+
+    # Reads cover both tiers: the hot tables after the user's last archived day, and the
+    # archive before it. Each side is an index range scan in (date, check_in) order, which
+    # SQLite merges for the ORDER BY of the UNION ALL without sorting.
+
+    def _tiered_range(self, start_date, end_date):
+        # Parameters of a two-tier range query: user and range for each side
+        start_date, end_date = to_ordinal(start_date), to_ordinal(end_date)
+        return (self.user_id, start_date, end_date, self.user_id,
+                self.user_id, start_date, end_date)
+
+    def get_entries(self, start_date, end_date):
+        cursor = self.conn.cursor()
+        cursor.row_factory = _entry_factory
+        cursor.execute(f'''
+            SELECT {ENTRY_COLUMNS} FROM work_entries
+            WHERE user_id = ? AND date BETWEEN ? AND ? AND {_AFTER_ARCHIVED}
+            UNION ALL
+            SELECT {ENTRY_COLUMNS} FROM archive.entries
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date, check_in
+        ''', self._tiered_range(start_date, end_date))
         return cursor.fetchall()
 
     def get_entry(self, date, check_in):
         cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM work_entries
-            WHERE date = ? AND check_in = ?
-        """, (date, check_in))
+        cursor.row_factory = _entry_factory
+        cursor.execute(f"""
+            SELECT {ENTRY_COLUMNS} FROM work_entries
+            WHERE user_id = ? AND date = ? AND check_in = ?
+            UNION ALL
+            SELECT {ENTRY_COLUMNS} FROM archive.entries
+            WHERE user_id = ? AND date = ? AND check_in = ?
+        """, (self.user_id, to_ordinal(date), to_minutes(check_in)) * 2)
+        return cursor.fetchone()
+
+    def get_entry_by_id(self, entry_id):
+        # Ids are AUTOINCREMENT and kept by archive(), so an id is in one tier only
+        cursor = self.conn.cursor()
+        cursor.row_factory = _entry_factory
+        cursor.execute(f'''
+            SELECT {ENTRY_COLUMNS} FROM work_entries WHERE id = ? AND user_id = ?
+            UNION ALL
+            SELECT {ENTRY_COLUMNS} FROM archive.entries WHERE id = ? AND user_id = ?
+        ''', (entry_id, self.user_id) * 2)
         return cursor.fetchone()
 
+    def iter_entries(self, start_date, end_date, batch_size=1000):
+        # Streams Entry records in (date, check_in) order without materializing the range
+        cursor = self.conn.cursor()
+        cursor.row_factory = _entry_factory
+        cursor.execute(f'''
+            SELECT {ENTRY_COLUMNS} FROM work_entries
+            WHERE user_id = ? AND date BETWEEN ? AND ? AND {_AFTER_ARCHIVED}
+            UNION ALL
+            SELECT {ENTRY_COLUMNS} FROM archive.entries
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date, check_in
+        ''', self._tiered_range(start_date, end_date))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield from batch
+
+    def get_entry_rows(self, start_date, end_date):
+        # Plain-tuple cursor for columnar consumers; missing check_in/check_out come back as -1
+        return self.conn.execute(f'''
+            SELECT id, date, COALESCE(check_in, -1) AS check_in, COALESCE(check_out, -1), type, hours, lunch_break
+            FROM work_entries
+            WHERE user_id = ? AND date BETWEEN ? AND ? AND {_AFTER_ARCHIVED}
+            UNION ALL
+            SELECT id, date, COALESCE(check_in, -1), COALESCE(check_out, -1), type, hours, lunch_break
+            FROM archive.entries
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date, check_in
+        ''', self._tiered_range(start_date, end_date))
+
+    def get_daily_totals(self, start_date, end_date):
+        # Rows of (date, worked_hours, leave_hours, overtime_hours); days without entries are absent
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT date, worked_hours, leave_hours, overtime_hours FROM daily_totals
+            WHERE user_id = ? AND date BETWEEN ? AND ? AND {_AFTER_ARCHIVED}
+            UNION ALL
+            SELECT date, worked_hours, leave_hours, overtime_hours FROM archive.daily_totals
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date
+        ''', self._tiered_range(start_date, end_date))
+        return cursor.fetchall()
+
+    def get_balance(self, from_date=None, to_date=None):
+        # Overtime hours accumulated between the two dates (inclusive); None leaves a side open
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT (SELECT TOTAL(overtime_hours) FROM daily_totals
+                    WHERE user_id = ? AND date BETWEEN ? AND ? AND {_AFTER_ARCHIVED})
+                 + (SELECT TOTAL(overtime_hours) FROM archive.daily_totals
+                    WHERE user_id = ? AND date BETWEEN ? AND ?)
+        ''', self._tiered_range(from_date if from_date is not None else 0,
+                                to_date if to_date is not None else date.max.toordinal()))
+        return cursor.fetchone()[0]
+
+    def get_archived_through(self):
+        # Last day of this user's archived history, or None if nothing was archived
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT through FROM archive.archive_state WHERE user_id = ?', (self.user_id,))
+        result = cursor.fetchone()
+        return date.fromordinal(result[0]) if result else None
+
+    def archive(self, through, vacuum=False):
+        # Moves this user's entries and daily totals up to and including day `through` from the
+        # hot tables to the archive, where they stay readable but can no longer be changed.
+        # Returns the number of entries moved. The removal is not replicated (other machines keep
+        # their copies) and drops the undo history of the archived days.
+        through = to_ordinal(through)
+        with self.transaction() as cursor:
+            current = cursor.execute('SELECT through FROM archive.archive_state WHERE user_id = ?',
+                                     (self.user_id,)).fetchone()
+            if current is not None and current[0] >= through:
+                return 0
+            # Copied and committed first, so a crash before the removal below loses nothing;
+            # the copies are keyed by uid, and a rerun skips rows it already moved
+            cursor.execute('''
+                INSERT OR IGNORE INTO archive.entries
+                    (id, user_id, uid, date, check_in, check_out, type, hours, lunch_break)
+                SELECT id, user_id, uid, date, check_in, check_out, type, hours, lunch_break
+                FROM work_entries WHERE user_id = ? AND date <= ?
+                ORDER BY date, check_in
+            ''', (self.user_id, through))
+            cursor.execute('''
+                INSERT OR REPLACE INTO archive.daily_totals
+                    (user_id, date, worked_hours, leave_hours, overtime_hours)
+                SELECT user_id, date, worked_hours, leave_hours, overtime_hours
+                FROM daily_totals WHERE user_id = ? AND date <= ?
+            ''', (self.user_id, through))
+            cursor.execute('''
+                INSERT INTO archive.archive_state (user_id, through) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET through = excluded.through
+            ''', (self.user_id, through))
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO sync_state (key, value) VALUES ('applying', '1')")
+            cursor.execute('DELETE FROM work_entries WHERE user_id = ? AND date <= ?', (self.user_id, through))
+            moved = cursor.rowcount
+            cursor.execute("DELETE FROM sync_state WHERE key = 'applying'")
+            # Undoing these operations would bring archived rows back into the hot tier
+            cursor.execute('''
+                SELECT DISTINCT r.op_id FROM journal_rows r JOIN journal_ops o ON o.id = r.op_id
+                WHERE o.user_id = ? AND (json_extract(r.before, '$[0]') <= ? OR json_extract(r.after, '$[0]') <= ?)
+            ''', (self.user_id, through, through))
+            ops = cursor.fetchall()
+            cursor.executemany('DELETE FROM journal_rows WHERE op_id = ?', ops)
+            cursor.executemany('DELETE FROM journal_ops WHERE id = ?', ops)
+        if vacuum:
+            self.conn.execute('VACUUM main')
+            self.conn.execute('VACUUM archive')
+        return moved
+
     def set_setting(self, key, value):
+        self.set_settings({key: value})
+
+    def set_settings(self, values):
+        # Writes several settings in one transaction
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO settings (user_id, key, value)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id, key) DO UPDATE SET value=excluded.value
+            ''', [(self.user_id, key, value) for key, value in values.items()])
+
+    def get_settings(self):
+        # All of this user's settings as {key: value}
         cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO settings (key, value)
-            VALUES (?, ?)
-            ON CONFLICT(key) DO UPDATE SET value=excluded.value
-        ''', (key, value))
-        self.conn.commit()
+        cursor.execute('SELECT key, value FROM settings WHERE user_id = ?', (self.user_id,))
+        return dict(cursor.fetchall())
 
     def get_setting(self, key):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
+        cursor.execute('SELECT value FROM settings WHERE user_id = ? AND key = ?', (self.user_id, key))
         result = cursor.fetchone()
         return result[0] if result else None
 
+    def save_template(self, name, slots):
+        # Creates or replaces this user's template `name`; slots are ScheduleSlot-like tuples
+        slots = [ScheduleSlot(*slot) for slot in slots]
+        for slot in slots:
+            if not 0 <= slot.weekday <= 6:
+                raise ValueError(f"Weekday must be 0 (Monday) to 6, not {slot.weekday}")
+            validate_entry(slot.check_in, slot.check_out, None)
+            if slot.type not in ENTRY_TYPES:
+                raise ValueError(f"Unknown entry type: {slot.type}")
+        # Slots of one weekday may touch but not overlap
+        ordered = sorted(slots, key=lambda slot: (slot.weekday, slot.check_in))
+        for a, b in zip(ordered, ordered[1:]):
+            if a.weekday == b.weekday and b.check_in < a.check_out:
+                raise ValueError(f"Overlapping slots on weekday {a.weekday}: "
+                                 f"{format_minutes(a.check_in)}-{format_minutes(a.check_out)} and "
+                                 f"{format_minutes(b.check_in)}-{format_minutes(b.check_out)}")
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO schedule_templates (user_id, name) VALUES (?, ?)
+                ON CONFLICT(user_id, name) DO NOTHING
+            ''', (self.user_id, name))
+            template_id = cursor.execute('SELECT id FROM schedule_templates WHERE user_id = ? AND name = ?',
+                                         (self.user_id, name)).fetchone()[0]
+            cursor.execute('DELETE FROM schedule_slots WHERE template_id = ?', (template_id,))
+            cursor.executemany('''
+                INSERT INTO schedule_slots (template_id, weekday, check_in, check_out, type, lunch_break)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(template_id, *slot) for slot in slots])
+
+    def get_template(self, name):
+        # Slots of this user's template `name` in (weekday, check_in) order, or None if there is none
+        cursor = self.conn.cursor()
+        template = cursor.execute('SELECT id FROM schedule_templates WHERE user_id = ? AND name = ?',
+                                  (self.user_id, name)).fetchone()
+        if template is None:
+            return None
+        cursor.execute('''
+            SELECT weekday, check_in, check_out, type, lunch_break FROM schedule_slots
+            WHERE template_id = ? ORDER BY weekday, check_in
+        ''', template)
+        return [ScheduleSlot._make(row) for row in cursor.fetchall()]
+
+    def get_template_names(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT name FROM schedule_templates WHERE user_id = ? ORDER BY name', (self.user_id,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def delete_template(self, name):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM schedule_slots WHERE template_id IN (
+                    SELECT id FROM schedule_templates WHERE user_id = ? AND name = ?
+                )
+            ''', (self.user_id, name))
+            cursor.execute('DELETE FROM schedule_templates WHERE user_id = ? AND name = ?', (self.user_id, name))
+
+    def set_schedule_days(self, start_date, end_date, kind):
+        # Marks every day of the range as HOLIDAY or a leave type for templates to honour;
+        # kind None clears the marks
+        if kind is not None and kind != HOLIDAY and kind not in ENTRY_TYPES[1:]:
+            raise ValueError(f"Unknown day kind: {kind}")
+        start_date, end_date = to_ordinal(start_date), to_ordinal(end_date)
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM schedule_days WHERE user_id = ? AND date BETWEEN ? AND ?',
+                           (self.user_id, start_date, end_date))
+            if kind is not None:
+                cursor.executemany('INSERT INTO schedule_days (user_id, date, kind) VALUES (?, ?, ?)',
+                                   [(self.user_id, day, kind) for day in range(start_date, end_date + 1)])
+
+    def get_schedule_days(self, start_date, end_date):
+        # {day ordinal: kind} of the marked days in the range
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT date, kind FROM schedule_days WHERE user_id = ? AND date BETWEEN ? AND ?
+        ''', (self.user_id, to_ordinal(start_date), to_ordinal(end_date)))
+        return dict(cursor.fetchall())
+
+    def get_changes(self, since, limit=500, exclude_origin=None):
+        # This user's rows changed after change_log version since, oldest first, as
+        # (version, row) where row is a SYNC_COLUMNS dict, or (version, uid) for a deleted row.
+        # Returns (changes, watermark, more): watermark is the since of the next call and more
+        # tells whether changes are still waiting. exclude_origin skips what that client sent.
+        # A row archived since its change is sent as it is in the archive, not as a deletion.
+        cursor = self.conn.cursor()
+        latest = cursor.execute('SELECT COALESCE(MAX(version), 0) FROM change_log').fetchone()[0]
+        origin_clause = 'AND c.origin IS NOT ?' if exclude_origin is not None else ''
+        cursor.execute(f'''
+            SELECT c.version, c.uid, e.id IS NULL AND a.id IS NULL, COALESCE(e.date, a.date),
+                   COALESCE(e.check_in, a.check_in), COALESCE(e.check_out, a.check_out), COALESCE(e.type, a.type),
+                   COALESCE(e.hours, a.hours), COALESCE(e.lunch_break, a.lunch_break)
+            FROM change_log c LEFT JOIN work_entries e ON e.uid = c.uid LEFT JOIN archive.entries a ON a.uid = c.uid
+            WHERE c.user_id = ? AND c.version > ? AND c.version <= ? {origin_clause}
+            ORDER BY c.version
+            LIMIT ?
+        ''', (self.user_id, since, latest, *([exclude_origin] if exclude_origin is not None else []), limit))
+        changes = []
+        for version, uid, deleted, *row in cursor.fetchall():
+            changes.append((version, uid if deleted else dict(zip(SYNC_COLUMNS, (uid, *row)))))
+        more = len(changes) == limit
+        return changes, (changes[-1][0] if more else max(latest, since)), more
+
+    def apply_remote_changes(self, changes, origin=None, replicated=False):
+        # Writes rows received from another machine by uid: a SYNC_COLUMNS dict is upserted,
+        # a bare uid deleted. Rows are taken as they are, without overlap resolution; they come
+        # from a database that resolved them already. origin (on the server) records which
+        # client sent them; replicated=True (on a client) keeps them out of change_log so they
+        # are not pushed back. Changes to history this database archived are skipped. Raises
+        # ValueError, writing nothing, if any row is not a valid entry in storage format.
+        upserts, deletes = [], []
+        for change in changes:
+            if isinstance(change, str):
+                deletes.append(change)
+            else:
+                row = tuple(change[column] for column in SYNC_COLUMNS)
+                validate_sync_row(row)
+                upserts.append((*row, self.user_id))
+        with self.transaction() as cursor:
+            upserts, deletes = self._skip_archived(cursor, upserts, deletes)
+            if replicated:
+                cursor.execute("INSERT INTO sync_state (key, value) VALUES ('applying', '1')")
+            if origin is not None:
+                cursor.execute("INSERT INTO sync_state (key, value) VALUES ('origin', ?)", (origin,))
+            if self._listeners:
+                self._mark_changed(row[1] for row in upserts)
+                uids = [row[0] for row in upserts] + deletes
+                for i in range(0, len(uids), 500):
+                    chunk = uids[i:i + 500]
+                    cursor.execute(f"""
+                        SELECT DISTINCT date FROM work_entries
+                        WHERE user_id = ? AND uid IN ({','.join('?' * len(chunk))})
+                    """, (self.user_id, *chunk))
+                    self._mark_changed(row[0] for row in cursor.fetchall())
+            cursor.executemany('DELETE FROM work_entries WHERE uid = ? AND user_id = ?',
+                               [(uid, self.user_id) for uid in deletes])
+            cursor.executemany('''
+                INSERT INTO work_entries (uid, date, check_in, check_out, type, hours, lunch_break, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (uid) DO UPDATE SET
+                    date = excluded.date, check_in = excluded.check_in, check_out = excluded.check_out,
+                    type = excluded.type, hours = excluded.hours, lunch_break = excluded.lunch_break
+                WHERE user_id = excluded.user_id
+            ''', upserts)
+            cursor.execute("DELETE FROM sync_state WHERE key IN ('applying', 'origin')")
+
+    def _skip_archived(self, cursor, upserts, deletes):
+        through = cursor.execute('SELECT through FROM archive.archive_state WHERE user_id = ?',
+                                 (self.user_id,)).fetchone()
+        if through is None:
+            return upserts, deletes
+        uids = [row[0] for row in upserts] + deletes
+        archived = set()
+        for i in range(0, len(uids), 500):
+            chunk = uids[i:i + 500]
+            cursor.execute(f"""
+                SELECT uid FROM archive.entries WHERE uid IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            archived.update(row[0] for row in cursor.fetchall())
+        return ([row for row in upserts if row[1] > through[0] and row[0] not in archived],
+                [uid for uid in deletes if uid not in archived])
+
+    def get_sync_state(self, key):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT value FROM sync_state WHERE key = ?', (key,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    def set_sync_state(self, key, value):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO sync_state (key, value)
+                VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value=excluded.value
+            ''', (key, value))
+
+    def get_users(self):
+        # Every user with recorded entries or settings
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT user_id FROM work_entries UNION SELECT user_id FROM archive.entries
+            UNION SELECT user_id FROM settings ORDER BY 1
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
     def close(self):
+        # Lets SQLite refresh query planner statistics for the queries this connection ran
+        try:
+            self.conn.execute('PRAGMA optimize')
+        except sqlite3.Error:
+            pass
         self.conn.close()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
     def update_entry(self, old_date, old_check_in, old_check_out, new_date, new_check_in, new_check_out, new_type, new_hours, new_lunch_break):
-        if new_check_in and new_check_out:
-            self.resolve_overlaps(new_date, new_check_in, new_check_out, exclude=(old_date, old_check_in, old_check_out))
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE work_entries
-            SET date = ?, check_in = ?, check_out = ?, type = ?, hours = ?, lunch_break = ?
-            WHERE date = ? AND check_in = ? AND check_out = ?
-        """, (new_date, new_check_in, new_check_out, new_type, new_hours, new_lunch_break, old_date, old_check_in, old_check_out))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT id FROM work_entries
+                WHERE user_id = ? AND date = ? AND check_in = ? AND check_out = ?
+            """, (self.user_id, to_ordinal(old_date), to_minutes(old_check_in), to_minutes(old_check_out)))
+            row = cursor.fetchone()
+            if row is not None:
+                self.update_entry_by_id(row[0], new_date, new_check_in, new_check_out, new_type, new_hours, new_lunch_break)
+
+    def update_entry_by_id(self, entry_id, date, check_in, check_out, entry_type, hours, lunch_break):
+        # Raises ValueError for invalid times or when this user has no such row, e.g. another
+        # client deleted it
+        date, check_in, check_out = to_ordinal(date), to_minutes(check_in), to_minutes(check_out)
+        validate_entry(check_in, check_out, hours)
+        with self.transaction() as cursor:
+            cursor.execute('SELECT 1 FROM work_entries WHERE id = ? AND user_id = ?', (entry_id, self.user_id))
+            if cursor.fetchone() is None:
+                self._check_not_archived(cursor, [], [entry_id])
+                raise ValueError(f"Entry {entry_id} no longer exists")
+            if check_in is None or check_out is None:
+                self.apply_changes([('update', entry_id, (date, check_in, check_out, entry_type, hours, lunch_break))])
+                return
+            # The row leaves its old place and is re-inserted under the same id, overriding what it overlaps
+            day = self._load_days([date])[date]
+            day.remove(entry_id, record=False)
+            day.insert(check_in, check_out, entry_type, hours, lunch_break, entry_id=entry_id)
+            self.apply_changes(day.changes())
 
     def delete_entry(self, date, check_in, check_out):
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT id FROM work_entries
+                WHERE user_id = ? AND date = ? AND check_in = ? AND check_out = ?
+            """, (self.user_id, to_ordinal(date), to_minutes(check_in), to_minutes(check_out)))
+            self.apply_changes(('delete', row[0]) for row in cursor.fetchall())
+
+    def delete_entry_by_id(self, entry_id):
+        self.apply_changes([('delete', entry_id)])
+
+    def get_open_entry(self):
+        # The entry of a running clock-in: check_in set, check_out NULL, hours 0 until clock_out()
         cursor = self.conn.cursor()
-        print("database is told to delete")
-        cursor.execute("""
-            DELETE FROM work_entries
-            WHERE date = ? AND check_in = ? AND check_out = ?
-        """, (date, check_in, check_out))
-        self.conn.commit()
+        cursor.row_factory = _entry_factory
+        cursor.execute(f'''
+            SELECT {ENTRY_COLUMNS} FROM work_entries
+            WHERE user_id = ? AND check_in IS NOT NULL AND check_out IS NULL
+            ORDER BY date DESC, check_in DESC LIMIT 1
+        ''', (self.user_id,))
+        return cursor.fetchone()
+
+    def clock_in(self, when=None, entry_type='Working'):
+        # Opens an entry at `when` (a datetime, default now) and returns it. It takes no part in
+        # overlap resolution or totals until clock_out() closes it.
+        when = when or datetime.now()
+        with self.transaction():
+            if self.get_open_entry() is not None:
+                raise ValueError("Already clocked in")
+            self.apply_changes([('insert', (when.date().toordinal(), when.hour * 60 + when.minute, None,
+                                            entry_type, 0.0, False))])
+            return self.get_open_entry()
+
+    def clock_out(self, when=None):
+        # Closes the open entry at `when` (default now), split at midnight if the session ran past
+        # it; the pieces override what they overlap, like any added entry. Returns the hours.
+        when = when or datetime.now()
+        with self.transaction():
+            entry = self.get_open_entry()
+            if entry is None:
+                raise ValueError("Not clocked in")
+            end_date, end = when.date().toordinal(), when.hour * 60 + when.minute
+            if (end_date, end) <= (entry.date, entry.check_in):
+                self.apply_changes([('delete', entry.id)])
+                return 0.0
+            pieces = []
+            day, start = entry.date, entry.check_in
+            while day < end_date:
+                pieces.append((day, start, 24 * 60))
+                day, start = day + 1, 0
+            if end > start:
+                pieces.append((day, start, end))
+            rows = [(day, start, end, entry.type, (end - start) / 60, default_lunch_break(entry.type, (end - start) / 60))
+                    for day, start, end in pieces]
+            # The first piece keeps the row, and its uid, so replicas see the session close
+            self.update_entry_by_id(entry.id, *rows[0])
+            if len(rows) > 1:
+                self.add_entries(rows[1:])
+            return sum(row[4] for row in rows)
 
     def resolve_overlaps(self, date, new_check_in, new_check_out, exclude=None):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT date, check_in, check_out, hours, type, lunch_break FROM work_entries 
-            WHERE date = ?
-            ORDER BY check_in
-        """, (date,))
-        entries = cursor.fetchall()
+        # Trims, splits or deletes the entries overlapping [new_check_in, new_check_out)
+        date = to_ordinal(date)
+        day = self._load_days([date])[date]
+        if exclude:
+            excluded = day.find(to_minutes(exclude[1]))
+            if excluded and (excluded.start, excluded.end) == (to_minutes(exclude[1]), to_minutes(exclude[2])):
+                day.remove(excluded.id, record=False)
+        day.clear(to_minutes(new_check_in), to_minutes(new_check_out))
+        self.apply_changes(day.changes())
 
-        new_start = datetime.strptime(new_check_in, "%H:%M")
-        new_end = datetime.strptime(new_check_out, "%H:%M")
+class DatabasePool:
+    # Thread-safe pool of Database connections to one file, for servers and batch jobs where
+    # many clients record hours at once. Up to max_connections are opened on demand and each
+    # is lent to one caller at a time, acting for the user it was checked out for. Under the
+    # WAL profiles readers never block the writer; writers take the lock with BEGIN IMMEDIATE
+    # and queue on the busy handler rather than failing with "database is locked".
 
-        for entry_date, check_in, check_out, hours, entry_type, lunch_break in entries:
-            if exclude and (entry_date, check_in, check_out) == exclude:
-                continue
+    def __init__(self, db_path, max_connections=8, profile=DEFAULT_PROFILE, timeout=BUSY_TIMEOUT):
+        self.db_path = db_path
+        self.profile = profile
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, user_id=DEFAULT_USER):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection free after {self.timeout} s")
+        try:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                db = Database(self.db_path, check_same_thread=False, profile=self.profile,
+                              user_id=user_id, timeout=self.timeout)
+                with self._lock:
+                    self._connections.append(db)
+            db.user_id = user_id
+            try:
+                yield db
+            finally:
+                # Listeners belong to the borrower, not to the pooled connection
+                db._listeners.clear()
+                self._idle.put(db)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
 
-            start = datetime.strptime(check_in, "%H:%M")
-            end = datetime.strptime(check_out, "%H:%M")
-
-            if new_start < end and new_end > start:
-                if new_start <= start and new_end >= end:
-                    # Complete overlap, delete the existing entry
-                    self.delete_entry(entry_date, check_in, check_out)
-                elif new_start > start and new_end < end:
-                    # New entry is inside existing entry, split the existing entry
-                    self.update_entry(entry_date, check_in, check_out, 
-                                    entry_date, check_in, new_start.strftime("%H:%M"), 
-                                    entry_type, (new_start - start).seconds / 3600, lunch_break)
-                    self.add_entry(entry_date, new_end.strftime("%H:%M"), check_out, entry_type, 
-                                (end - new_end).seconds / 3600, lunch_break)
-                elif new_start <= start:
-                    # Overlap at the start
-                    self.update_entry(entry_date, check_in, check_out,
-                                    entry_date, new_end.strftime("%H:%M"), check_out,
-                                    entry_type, (end - new_end).seconds / 3600, lunch_break)
-                elif new_end >= end:
-                    # Overlap at the end
-                    self.update_entry(entry_date, check_in, check_out,
-                                    entry_date, check_in, new_start.strftime("%H:%M"),
-                                    entry_type, (new_start - start).seconds / 3600, lunch_break)
-                    
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,199 @@
+# importer.py
+import csv
+import json
+import time
+from datetime import date, datetime
+from database import ENTRY_TYPES, default_lunch_break, validate_entry
+
+_TYPES = {t.lower(): t for t in ENTRY_TYPES}
+_TRUE = {'1', 'true', 'yes', 'y'}
+_FALSE = {'0', 'false', 'no', 'n', ''}
+
+class RowError(ValueError):
+    pass
+
+class ImportStats:
+    def __init__(self, max_errors=100):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []  # (row number, message), at most max_errors kept
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, row_number, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((row_number, message))
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.imported} imported, {self.rejected} rejected of {self.read} rows "
+                f"in {self.elapsed:.2f} s ({self.rows_per_second:,.0f} rows/s)")
+
+def parse_date(value):
+    value = str(value).strip()
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        pass
+    try:
+        # The format the week view shows under each day
+        return datetime.strptime(value, '%d.%m.%Y').date().toordinal()
+    except ValueError:
+        raise RowError(f"invalid date '{value}'")
+
+def parse_time(value):
+    if value is None or str(value).strip() == '':
+        return None
+    parts = str(value).strip().split(':')
+    try:
+        if len(parts) not in (2, 3):
+            raise ValueError
+        hours, minutes = int(parts[0]), int(parts[1])
+    except ValueError:
+        raise RowError(f"invalid time '{value}'")
+    if not (0 <= minutes < 60 and 0 <= hours * 60 + minutes <= 24 * 60):
+        raise RowError(f"time out of range '{value}'")
+    return hours * 60 + minutes
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise RowError(f"invalid lunch_break '{value}'")
+
+def normalize(record):
+    # One input record -> (date, check_in, check_out, type, hours, lunch_break) in storage format;
+    # a RowError in place of a record is one the reader could not decode
+    if isinstance(record, RowError):
+        raise record
+    if not isinstance(record, dict):
+        raise RowError(f"expected an object, got {type(record).__name__}")
+    if not record.get('date'):
+        raise RowError("missing date")
+    entry_date = parse_date(record['date'])
+    entry_type = _TYPES.get(str(record.get('type') or 'Working').strip().lower())
+    if entry_type is None:
+        raise RowError(f"unknown type '{record.get('type')}'")
+
+    check_in, check_out = parse_time(record.get('check_in')), parse_time(record.get('check_out'))
+    if (check_in is None) != (check_out is None):
+        raise RowError("check_in and check_out must be given together")
+    if check_in is not None:
+        hours = (check_out - check_in) / 60
+    else:
+        try:
+            hours = float(record.get('hours'))
+        except (TypeError, ValueError):
+            raise RowError("hours are required for entries without times")
+    # The rules add_entries enforces, checked here so one bad row does not fail its chunk
+    try:
+        validate_entry(check_in, check_out, hours)
+    except ValueError as e:
+        raise RowError(str(e))
+
+    lunch = record.get('lunch_break')
+    if lunch is None or (isinstance(lunch, str) and lunch.strip() == ''):
+        lunch_break = default_lunch_break(entry_type, hours)
+    else:
+        lunch_break = parse_bool(lunch)
+    return entry_date, check_in, check_out, entry_type, hours, lunch_break
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+def read_json(path, chunk_size=1 << 16):
+    # JSON Lines, or a top-level array decoded incrementally one object at a time
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            for line in _lines(buffer, f):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        # Passed on to normalize, so the line is rejected like any invalid record
+                        record = RowError(f"invalid JSON: {e.msg}")
+                    yield record
+            return
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                more = f.read(chunk_size)
+                if not more:
+                    # Nothing after a malformed array item can be told apart reliably
+                    yield RowError("invalid JSON, the rest of the array was not read")
+                    return
+                buffer += more
+                continue
+            yield record
+            buffer = buffer[end:]
+            if len(buffer) < chunk_size:
+                buffer += f.read(chunk_size)
+
+def _lines(head, f):
+    # The already-read head of the file followed by the rest of it, line by line
+    rest = head.split('\n')
+    for line in rest[:-1]:
+        yield line
+    tail = rest[-1]
+    for line in f:
+        yield tail + line
+        tail = ''
+    if tail:
+        yield tail
+
+def read_records(path, fmt=None):
+    fmt = fmt or ('csv' if str(path).lower().endswith('.csv') else 'json')
+    if fmt == 'csv':
+        return read_csv(path)
+    if fmt == 'json':
+        return read_json(path)
+    raise ValueError(f"Unknown import format: {fmt}")
+
+def import_records(db, records, chunk_size=5000, stats=None):
+    # Validates and normalizes records, then writes each chunk through add_entries: overlaps are
+    # resolved per day in memory and every chunk is a single transaction
+    stats = stats or ImportStats()
+    # Archived days are read-only; add_entries would fail the whole chunk for one such row
+    archived_through = db.get_archived_through()
+    archived_through = archived_through.toordinal() if archived_through else 0
+    chunk = []
+    for row_number, record in enumerate(records, start=1):
+        stats.read += 1
+        try:
+            row = normalize(record)
+            if row[0] <= archived_through:
+                raise RowError(f"{date.fromordinal(row[0])} is archived and cannot be changed")
+            chunk.append(row)
+        except RowError as e:
+            stats.reject(row_number, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            db.add_entries(chunk)
+            stats.imported += len(chunk)
+            chunk = []
+    if chunk:
+        db.add_entries(chunk)
+        stats.imported += len(chunk)
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
+
+def import_file(db, path, fmt=None, chunk_size=5000):
+    return import_records(db, read_records(path, fmt), chunk_size)
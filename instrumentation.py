@@ -0,0 +1,191 @@
+# instrumentation.py
+import functools
+import inspect
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger('hours.perf')
+sql_logger = logging.getLogger('hours.sql')
+stats_logger = logging.getLogger('hours.perf.stats')
+
+# Database methods that are not worth a span of their own
+_UNTIMED_METHODS = {'transaction', 'add_listener', 'remove_listener'}
+
+_NO_SPAN = nullcontext()
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r'\s+')
+
+def statement_key(sql):
+    # Traced SQL has its parameters expanded; collapse literals so every run of a statement aggregates
+    return _WHITESPACE.sub(' ', _LITERALS.sub('?', sql)).strip()[:160]
+
+class SpanStats:
+    __slots__ = ('count', 'total', 'max', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.total = self.max = self.last = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+class _SqlTracer:
+    # set_trace_callback only reports when a statement starts, so a statement's latency runs
+    # until the next one starts on the same connection or the enclosing Database call returns
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+        self.pending = None
+
+    def __call__(self, sql):
+        now = time.perf_counter()
+        self._close(now)
+        self.pending = (sql, now)
+
+    def flush(self):
+        if self.pending is not None:
+            self._close(time.perf_counter())
+
+    def _close(self, now):
+        if self.pending is not None:
+            sql, started = self.pending
+            self.pending = None
+            self.instrumentation.record('sql: ' + statement_key(sql), now - started, sql_logger)
+
+class Instrumentation:
+    # Opt-in timing spans (--perf). Disabled, span() returns a shared no-op context and nothing
+    # is wrapped, so the hot paths pay one attribute check.
+
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}  # span name -> SpanStats; SQL statements are named 'sql: <statement>'
+        self._lock = threading.Lock()
+        self._stats_handler = None
+
+    def enable(self, stats_path=None, max_bytes=1 << 20, backup_count=3):
+        # stats_path: rolling file of one JSON line per span and statement
+        self.enabled = True
+        if stats_path and self._stats_handler is None:
+            self._stats_handler = RotatingFileHandler(
+                stats_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            self._stats_handler.setFormatter(logging.Formatter('%(message)s'))
+            stats_logger.addHandler(self._stats_handler)
+            stats_logger.setLevel(logging.INFO)
+            stats_logger.propagate = False
+
+    def disable(self):
+        self.enabled = False
+        if self._stats_handler is not None:
+            stats_logger.removeHandler(self._stats_handler)
+            self._stats_handler.close()
+            self._stats_handler = None
+
+    def span(self, name):
+        return self._span(name) if self.enabled else _NO_SPAN
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds, log=logger):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = SpanStats()
+            stats.add(seconds)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s %.3f ms", name, seconds * 1000)
+        if self._stats_handler is not None:
+            stats_logger.info(json.dumps({'time': round(time.time(), 3), 'name': name,
+                                          'ms': round(seconds * 1000, 4)}))
+
+    def wrap(self, obj, attribute, name):
+        # Replaces obj.attribute with a timed version on this instance only
+        method = getattr(obj, attribute)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            with self._span(name):
+                return method(*args, **kwargs)
+        setattr(obj, attribute, timed)
+
+    def attach(self, db):
+        # A span around every public Database method plus per-statement SQL tracing
+        tracer = _SqlTracer(self)
+        db.conn.set_trace_callback(tracer)
+        for attribute, value in vars(type(db)).items():
+            if attribute.startswith('_') or attribute in _UNTIMED_METHODS or not callable(value):
+                continue
+            self._wrap_db_method(db, attribute, tracer)
+
+    def _wrap_db_method(self, db, attribute, tracer):
+        method = getattr(db, attribute)
+        name = 'db.' + attribute
+
+        if inspect.isgeneratorfunction(method):
+            # Calling a generator only creates it; the span is the time spent producing its
+            # items, recorded once the iteration ends, without the caller's work between them
+            @functools.wraps(method)
+            def timed_iteration(*args, **kwargs):
+                iterator = method(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    iterator.close()
+                    tracer.flush()
+                    self.record(name, elapsed)
+            setattr(db, attribute, timed_iteration)
+            return
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                tracer.flush()
+                self.record(name, time.perf_counter() - start)
+        setattr(db, attribute, timed)
+
+    def last(self, names):
+        # Most recent duration in seconds of each named span, None for spans not seen yet
+        with self._lock:
+            return [(name, self.stats[name].last if name in self.stats else None) for name in names]
+
+    def top(self, prefix, n=3):
+        # The n spans starting with prefix with the most total time, as (name, SpanStats)
+        with self._lock:
+            matching = [(name, stats) for name, stats in self.stats.items() if name.startswith(prefix)]
+        return sorted(matching, key=lambda item: item[1].total, reverse=True)[:n]
+
+    def summary(self):
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True)
+        lines = [f"{'span':<60} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for name, stats in items:
+            lines.append(f"{name[:60]:<60} {stats.count:>7} {stats.total * 1000:>10.1f} "
+                         f"{stats.total / stats.count * 1000:>9.3f} {stats.max * 1000:>9.3f}")
+        return '\n'.join(lines)
+
+# Process-wide instance: Database, weeks and the window all report here
+perf = Instrumentation()
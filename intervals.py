@@ -0,0 +1,138 @@
+# intervals.py
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# One timed work entry within a day; start/end are minutes since midnight.
+# id is None for entries that do not exist in the database yet.
+Interval = namedtuple('Interval', ['id', 'start', 'end', 'type', 'hours', 'lunch_break'])
+
+def _piece(interval, start, end, entry_id):
+    return interval._replace(id=entry_id, start=start, end=end, hours=(end - start) / 60)
+
+class DayIntervals:
+    """Sorted, non-overlapping intervals of a single day.
+
+    Mutations only touch the intervals they overlap (bisect + slice
+    replacement), and changes() diffs the result against the rows the
+    structure was loaded with, producing a batch for Database.apply_changes.
+
+    Rows loaded from the database can overlap each other (v0 data, imports
+    without overlap resolution, replicated rows). Such a day is handled
+    without the sorted-ends shortcut: lookups scan back for overlapping rows,
+    and rows the change does not reach are left as they are.
+    """
+
+    def __init__(self, date, intervals=()):
+        self.date = date
+        self._items = sorted((Interval(*i) for i in intervals), key=lambda i: i.start)
+        self._starts = [i.start for i in self._items]
+        self._ends = [i.end for i in self._items]
+        self._original = {i.id: i for i in self._items if i.id is not None}
+        self._start_of = {i.id: i.start for i in self._items if i.id is not None}
+        self._removed = set()
+        # Sorted by start, some row overlaps another iff some row overlaps its successor
+        self._overlaps = any(a.end > b.start for a, b in zip(self._items, self._items[1:]))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def _overlapping(self, start, end):
+        # Index range of the intervals that may overlap [start, end)
+        hi = bisect_left(self._starts, end)
+        if not self._overlaps:
+            # Ends are sorted too because intervals never overlap
+            return bisect_right(self._ends, start), hi
+        return next((i for i in range(hi) if self._ends[i] > start), hi), hi
+
+    def _replace(self, lo, hi, items):
+        for item in self._items[lo:hi]:
+            self._start_of.pop(item.id, None)
+        for item in items:
+            if item.id is not None:
+                self._start_of[item.id] = item.start
+        self._items[lo:hi] = items
+        self._starts[lo:hi] = [i.start for i in items]
+        self._ends[lo:hi] = [i.end for i in items]
+
+    def _find_index(self, minute):
+        i = bisect_right(self._starts, minute) - 1
+        while i >= 0:
+            if self._items[i].end > minute:
+                return i
+            if not self._overlaps:
+                break
+            i -= 1
+        return None
+
+    def find(self, minute):
+        # Interval containing the given minute, or None
+        i = self._find_index(minute)
+        return None if i is None else self._items[i]
+
+    def clear(self, start, end):
+        # Remove coverage of [start, end), trimming or splitting the intervals it overlaps
+        lo, hi = self._overlapping(start, end)
+        pieces = []
+        for item in self._items[lo:hi]:
+            if item.end <= start:
+                # Only possible on a day with overlapping rows
+                pieces.append(item)
+                continue
+            left = item.start < start
+            if left:
+                pieces.append(_piece(item, item.start, start, item.id))
+            if item.end > end:
+                # The right-hand piece keeps the row id unless the left one already did
+                pieces.append(_piece(item, end, item.end, None if left else item.id))
+            elif not left and item.id is not None:
+                self._removed.add(item.id)
+        pieces.sort(key=lambda item: item.start)
+        self._replace(lo, hi, pieces)
+
+    def insert(self, start, end, entry_type, hours, lunch_break, entry_id=None):
+        # Insert with override: the new interval wins over whatever it overlaps
+        self.clear(start, end)
+        lo = bisect_left(self._starts, start)
+        self._replace(lo, lo, [Interval(entry_id, start, end, entry_type, hours, lunch_break)])
+        self._removed.discard(entry_id)
+
+    def split(self, minute):
+        # Split the interval containing minute into two rows at that minute
+        lo = self._find_index(minute)
+        if lo is None or self._items[lo].start == minute:
+            return
+        item = self._items[lo]
+        self._replace(lo, lo + 1, [_piece(item, item.start, minute, item.id)])
+        # The right piece goes after any overlapping rows that start before minute
+        hi = bisect_right(self._starts, minute)
+        self._replace(hi, hi, [_piece(item, minute, item.end, None)])
+
+    def remove(self, entry_id, record=True):
+        # record=False detaches the row without deleting it, e.g. when it moves to another day
+        start = self._start_of.get(entry_id)
+        if start is None:
+            return None
+        i = bisect_left(self._starts, start)
+        while self._items[i].id != entry_id:
+            # Rows sharing a start, on a day with overlapping rows
+            i += 1
+        item = self._items[i]
+        self._replace(i, i + 1, [])
+        if record:
+            self._removed.add(entry_id)
+        else:
+            self._original.pop(entry_id, None)
+        return item
+
+    def changes(self):
+        batch = [('delete', entry_id) for entry_id in self._removed if entry_id in self._original]
+        for item in self._items:
+            row = (self.date, item.start, item.end, item.type, item.hours, item.lunch_break)
+            if item.id is None:
+                batch.append(('insert', row))
+            elif self._original.get(item.id) != item:
+                batch.append(('update', item.id, row))
+        return batch
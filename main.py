@@ -1,5 +1,36 @@
 # main.py
-from ui.main_window import main
+import argparse
+import logging
+import sys
+from ui.startup import StartupProfiler
+
+def parse_args(argv):
+    # The app's own flags; the rest of argv is left for QApplication (e.g. -platform offscreen)
+    parser = argparse.ArgumentParser(prog='main.py', description="Work hours tracker", allow_abbrev=False)
+    parser.add_argument('--user', help="record hours for USER in a shared database; "
+                                       "without it the single-user data is shown")
+    parser.add_argument('--perf', action='store_true', help="log timing spans and SQL statements to stderr")
+    parser.add_argument('--perf-stats', metavar='FILE', help="rolling file of timing records, one JSON line each")
+    parser.add_argument('--profile-startup', action='store_true', help="report the time of each startup phase")
+    return parser.parse_known_args(argv)
+
+def enable_perf(args):
+    if not args.perf and not args.perf_stats:
+        return
+    from instrumentation import perf
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
+    logging.getLogger('hours.perf').setLevel(logging.DEBUG)
+    logging.getLogger('hours.sql').setLevel(logging.DEBUG)
+    perf.enable(stats_path=args.perf_stats)
 
 if __name__ == '__main__':
-    main()
+    args, qt_args = parse_args(sys.argv[1:])
+    sys.argv[1:] = qt_args
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    enable_perf(args)
+    with profiler.phase("import ui.main_window"):
+        from ui.main_window import main
+    if args.user is not None:
+        main(profiler, args.user)
+    else:
+        main(profiler)
@@ -0,0 +1,105 @@
+# report.py
+import csv
+import json
+from database import DAILY_NORM_HOURS, format_minutes
+
+REPORT_FIELDS = ['date', 'check_in', 'check_out', 'type', 'hours', 'lunch_break']
+
+class ReportTotals:
+    # Streaming version of the daily_totals rules: entries arrive in date order, so only the
+    # current day is held in memory
+    def __init__(self):
+        self.days = 0
+        self.worked_hours = 0.0
+        self.leave_hours = 0.0
+        self.overtime_hours = 0.0
+        self._day = None
+        self._day_hours = 0.0
+
+    def add(self, entry):
+        if entry.date != self._day:
+            self._close_day()
+            self._day = entry.date
+            self.days += 1
+        if entry.type == 'Working':
+            self.worked_hours += entry.hours
+        else:
+            self.leave_hours += entry.hours
+        self._day_hours += entry.hours
+
+    def _close_day(self):
+        self.overtime_hours += max(self._day_hours - DAILY_NORM_HOURS, 0)
+        self._day_hours = 0.0
+
+    def as_dict(self):
+        self._close_day()
+        return {
+            'days': self.days,
+            'worked_hours': round(self.worked_hours, 4),
+            'leave_hours': round(self.leave_hours, 4),
+            'overtime_hours': round(self.overtime_hours, 4),
+        }
+
+def report_rows(db, start_date, end_date, totals=None, batch_size=1000):
+    # One dict per entry, in REPORT_FIELDS order; feeds totals as a side effect
+    for entry in db.iter_entries(start_date, end_date, batch_size):
+        if totals is not None:
+            totals.add(entry)
+        yield {
+            'date': entry.day.isoformat(),
+            'check_in': format_minutes(entry.check_in) if entry.check_in is not None else None,
+            'check_out': format_minutes(entry.check_out) if entry.check_out is not None else None,
+            'type': entry.type,
+            'hours': entry.hours,
+            'lunch_break': bool(entry.lunch_break),
+        }
+
+def write_csv(rows, out):
+    writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+def write_json(rows, out, totals):
+    # Written piecewise so the entry list is never built in memory
+    out.write('{"entries": [')
+    for i, row in enumerate(rows):
+        out.write(',\n' if i else '\n')
+        out.write(json.dumps(row))
+    out.write('\n], "totals": ')
+    out.write(json.dumps(totals.as_dict()))
+    out.write('}\n')
+
+def write_parquet(rows, path, batch_size=10000):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires the pyarrow package")
+    schema = pa.schema([
+        ('date', pa.string()), ('check_in', pa.string()), ('check_out', pa.string()),
+        ('type', pa.string()), ('hours', pa.float64()), ('lunch_break', pa.bool_()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+def run_report(db, start_date, end_date, fmt, out=None, path=None):
+    # Returns the totals; csv/json go to the text stream out, parquet to path
+    totals = ReportTotals()
+    rows = report_rows(db, start_date, end_date, totals)
+    if fmt == 'csv':
+        write_csv(rows, out)
+    elif fmt == 'json':
+        write_json(rows, out, totals)
+    elif fmt == 'parquet':
+        write_parquet(rows, path)
+    else:
+        raise ValueError(f"Unknown report format: {fmt}")
+    return totals.as_dict()
@@ -0,0 +1,76 @@
+# schedules.py
+import numpy as np
+from database import ENTRY_TYPES, HOLIDAY, ScheduleSlot, default_lunch_break, to_minutes, to_ordinal
+from instrumentation import perf
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+_TYPES = {t.lower(): t for t in ENTRY_TYPES}
+
+def parse_slot(text):
+    # "mon-fri=08:00-16:00" or "sat=09:00-12:00=Sick Leave" -> [ScheduleSlot, ...], one per weekday
+    try:
+        days, times, *entry_type = text.split('=')
+        first, _, last = days.strip().lower().partition('-')
+        first_day = WEEKDAYS.index(first)
+        last_day = WEEKDAYS.index(last) if last else first_day
+        check_in, check_out = (to_minutes(t.strip()) for t in times.split('-'))
+        entry_type = _TYPES[entry_type[0].strip().lower()] if entry_type else 'Working'
+    except (ValueError, KeyError):
+        raise ValueError(f"invalid slot '{text}', expected DAYS=HH:MM-HH:MM[=TYPE], e.g. mon-fri=08:00-16:00")
+    if last_day < first_day:
+        raise ValueError(f"invalid weekday range in '{text}'")
+    lunch_break = default_lunch_break(entry_type, (check_out - check_in) / 60)
+    return [ScheduleSlot(day, check_in, check_out, entry_type, lunch_break)
+            for day in range(first_day, last_day + 1)]
+
+def expand(slots, start_date, end_date, days=None):
+    # Rows (date, check_in, check_out, type, hours, lunch_break) in storage format of the template
+    # slots over the range, generated for all days at once. days: {day ordinal: kind} from
+    # Database.get_schedule_days; HOLIDAY drops the day, a leave type turns its slots into leave.
+    start_date, end_date = to_ordinal(start_date), to_ordinal(end_date)
+    if not slots or end_date < start_date:
+        return []
+    types = list(ENTRY_TYPES)
+    slot_weekday = np.array([slot.weekday for slot in slots])
+    slot_in = np.array([slot.check_in for slot in slots])
+    slot_out = np.array([slot.check_out for slot in slots])
+    slot_type = np.array([types.index(slot.type) for slot in slots])
+    slot_lunch = np.array([bool(slot.lunch_break) for slot in slots])
+
+    ordinals = np.arange(start_date, end_date + 1)
+    weekdays = (ordinals - 1) % 7  # Ordinal 1, 0001-01-01, is a Monday
+    # Every (day, slot) pair whose weekday matches, in date then slot order
+    day_index, slot_index = np.nonzero(weekdays[:, None] == slot_weekday[None, :])
+    dates = ordinals[day_index]
+    check_in, check_out = slot_in[slot_index], slot_out[slot_index]
+    type_codes, lunch = slot_type[slot_index], slot_lunch[slot_index]
+
+    if days:
+        marked = np.array(sorted(days))
+        kinds = np.array([-1 if days[day] == HOLIDAY else types.index(days[day]) for day in marked])
+        position = np.minimum(np.searchsorted(marked, dates), len(marked) - 1)
+        hit = marked[position] == dates
+        kind = np.where(hit, kinds[position], -2)  # -2: unmarked, -1: holiday
+        keep = kind != -1
+        leave = kind >= 0
+        type_codes = np.where(leave, kind, type_codes)[keep]
+        lunch = (lunch & ~leave)[keep]
+        dates, check_in, check_out = dates[keep], check_in[keep], check_out[keep]
+
+    hours = (check_out - check_in) / 60
+    return list(zip(dates.tolist(), check_in.tolist(), check_out.tolist(),
+                    np.array(types, dtype=object)[type_codes].tolist(), hours.tolist(), lunch.tolist()))
+
+def materialize(db, name, start_date, end_date):
+    # Writes template `name` over the range in one transaction through Database.add_entries, so
+    # the new entries override what they overlap and the whole run is a single undo step.
+    # Returns the number of entries written.
+    slots = db.get_template(name)
+    if slots is None:
+        raise ValueError(f"No schedule template named '{name}'")
+    with perf.span('materialize.expand'):
+        rows = expand(slots, start_date, end_date, db.get_schedule_days(start_date, end_date))
+    with perf.span('materialize.write'):
+        db.add_entries(rows)
+    return len(rows)
@@ -0,0 +1,78 @@
+# settings.py
+from datetime import date
+
+class Settings:
+    # In-memory view of one user's settings table. All settings are read in one query on
+    # first use and served from memory afterwards, parsed values included.
+    #
+    # set(..., persist=True) marks the key for writing and calls schedule_flush, which the
+    # caller uses to debounce: the UI restarts a single-shot QTimer wired to flush(), so a burst
+    # of changes costs one commit shortly after the last one. Without a scheduler every change
+    # is written through at once. persist=False keeps the value in memory until close(), for
+    # state such as the displayed week that is not worth a disk write per change.
+
+    def __init__(self, db, schedule_flush=None):
+        self.db = db
+        self.schedule_flush = schedule_flush
+        self._values = None
+        self._parsed = {}
+        self._dirty = set()     # Written by the next flush()
+        self._deferred = set()  # Written by close()
+
+    def _load(self):
+        if self._values is None:
+            self._values = self.db.get_settings()
+        return self._values
+
+    def get(self, key, default=None):
+        value = self._load().get(key)
+        return default if value is None else value
+
+    def set(self, key, value, persist=True):
+        value = None if value is None else str(value)
+        values = self._load()
+        if values.get(key) == value and key not in self._deferred:
+            return
+        values[key] = value
+        self._parsed.pop(key, None)
+        if not persist:
+            self._deferred.add(key)
+            return
+        self._deferred.discard(key)
+        self._dirty.add(key)
+        if self.schedule_flush is None:
+            self.flush()
+        else:
+            self.schedule_flush()
+
+    def _typed(self, key, parse, default):
+        if key not in self._parsed:
+            value = self.get(key)
+            try:
+                self._parsed[key] = default if value is None else parse(value)
+            except ValueError:
+                self._parsed[key] = default
+        return self._parsed[key]
+
+    def get_date(self, key, default=None):
+        return self._typed(key, date.fromisoformat, default)
+
+    def set_date(self, key, value, persist=True):
+        self.set(key, value.isoformat() if value is not None else None, persist)
+        self._parsed[key] = value
+
+    def flush(self):
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        try:
+            self.db.set_settings({key: self._values[key] for key in keys})
+        except Exception:
+            self._dirty |= keys
+            raise
+
+    def close(self):
+        # Writes everything still pending, deferred values included
+        self._dirty |= self._deferred
+        self._deferred.clear()
+        self.flush()
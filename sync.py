@@ -0,0 +1,179 @@
+# sync.py
+import json
+import logging
+import sqlite3
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database import DEFAULT_USER, SYNC_COLUMNS, DatabasePool
+
+# Delta replication between tracker databases over HTTP. The server exposes one shared database:
+#   GET  /changes?user=U&since=V&limit=N&origin=C  -> {"changes": [...], "watermark": V', "more": bool}
+#   POST /changes  {"user": U, "origin": C, "changes": [...]}  -> {"applied": n}
+# A change is a row as a SYNC_COLUMNS object, or the uid string of a deleted row. Clients
+# push their change_log since the last push, then pull everything newer than their watermark
+# that they did not send themselves. Conflicting edits of one row: the last push wins.
+
+logger = logging.getLogger('hours.sync')
+
+DEFAULT_PORT = 8765
+DEFAULT_BATCH = 500
+MAX_BATCH = 5000
+
+class SyncError(Exception):
+    pass
+
+def _valid_change(change):
+    if isinstance(change, str):
+        return True
+    return isinstance(change, dict) and all(column in change for column in SYNC_COLUMNS)
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'HoursSync/1'
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/changes':
+            return self._send(404, {'error': f"unknown path {url.path}"})
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            since = int(query.get('since', ['0'])[0])
+            limit = min(int(query.get('limit', [str(DEFAULT_BATCH)])[0]), MAX_BATCH)
+        except ValueError:
+            return self._send(400, {'error': "since and limit must be integers"})
+        if limit < 1:
+            return self._send(400, {'error': "limit must be positive"})
+        user = query.get('user', [DEFAULT_USER])[0]
+        origin = query.get('origin', [None])[0]
+        with self.server.pool.connection(user) as db:
+            changes, watermark, more = db.get_changes(since, limit, exclude_origin=origin)
+        self._send(200, {'changes': [change for _, change in changes], 'watermark': watermark, 'more': more})
+
+    def do_POST(self):
+        if urllib.parse.urlsplit(self.path).path != '/changes':
+            return self._send(404, {'error': f"unknown path {self.path}"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            changes = body['changes']
+            if not isinstance(changes, list) or not all(_valid_change(change) for change in changes):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return self._send(400, {'error': "expected {\"changes\": [row or uid, ...]}"})
+        if len(changes) > MAX_BATCH:
+            return self._send(413, {'error': f"at most {MAX_BATCH} changes per request"})
+        try:
+            with self.server.pool.connection(body.get('user', DEFAULT_USER)) as db:
+                db.apply_remote_changes(changes, origin=body.get('origin'))
+        except (ValueError, sqlite3.IntegrityError) as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, {'applied': len(changes)})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+class SyncServer(ThreadingHTTPServer):
+    # Serves one database file to sync clients; each request borrows a pooled connection
+    daemon_threads = True
+
+    def __init__(self, db_path, host='127.0.0.1', port=DEFAULT_PORT, max_connections=8):
+        self.pool = DatabasePool(db_path, max_connections)
+        super(SyncServer, self).__init__((host, port), SyncRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        # Serves on a daemon thread, e.g. as a localhost stand-in; stop with shutdown()
+        thread = threading.Thread(target=self.serve_forever, name='sync-server', daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        super(SyncServer, self).server_close()
+        self.pool.close()
+
+class SyncClient:
+    # Replicates one user's entries between a local Database and a SyncServer. Watermarks are
+    # kept per server and user in the local sync_state table, so a sync that fails halfway
+    # resumes where it stopped; re-sending a batch is harmless because rows are upserted by uid.
+
+    def __init__(self, db, url, batch_size=DEFAULT_BATCH, timeout=30):
+        self.db = db
+        self.url = url.rstrip('/')
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.client_id = db.get_sync_state('client_id')
+        if self.client_id is None:
+            self.client_id = uuid.uuid4().hex
+            db.set_sync_state('client_id', self.client_id)
+
+    def _key(self, name):
+        return f"{name}:{self.url}:{self.db.user_id}"
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise SyncError(f"{method} {path}: HTTP {e.code} {e.read().decode('utf-8', 'replace')}")
+        except urllib.error.URLError as e:
+            raise SyncError(f"{method} {path}: {e.reason}")
+
+    def push(self):
+        # Sends local changes in batches; returns how many were sent
+        key = self._key('pushed')
+        since = int(self.db.get_sync_state(key) or 0)
+        sent = 0
+        while True:
+            changes, watermark, more = self.db.get_changes(since, self.batch_size)
+            if changes:
+                self._request('POST', '/changes', {
+                    'user': self.db.user_id, 'origin': self.client_id,
+                    'changes': [change for _, change in changes],
+                })
+                sent += len(changes)
+            if watermark != since:
+                self.db.set_sync_state(key, str(watermark))
+                since = watermark
+            if not more:
+                return sent
+
+    def pull(self):
+        # Applies remote changes in batches; returns how many were received
+        key = self._key('pulled')
+        since = int(self.db.get_sync_state(key) or 0)
+        received = 0
+        while True:
+            query = urllib.parse.urlencode({'user': self.db.user_id, 'since': since,
+                                            'limit': self.batch_size, 'origin': self.client_id})
+            response = self._request('GET', '/changes?' + query)
+            # The batch and its watermark commit together
+            with self.db.transaction():
+                if response['changes']:
+                    self.db.apply_remote_changes(response['changes'], replicated=True)
+                self.db.set_sync_state(key, str(response['watermark']))
+            received += len(response['changes'])
+            since = response['watermark']
+            if not response['more']:
+                return received
+
+    def sync(self):
+        pushed = self.push()
+        pulled = self.pull()
+        return pushed, pulled
@@ -0,0 +1,32 @@
+# tests/test_clock.py
+from datetime import datetime
+
+from database import Database
+
+def test_undo_clock_out_reopens_entry():
+    db = Database(':memory:')
+    opened = db.clock_in(datetime(2024, 5, 6, 8, 0))
+    assert db.clock_out(datetime(2024, 5, 6, 12, 30)) == 4.5
+    assert db.get_open_entry() is None
+    db.undo()
+    assert db.get_open_entry() == opened
+    db.redo()
+    assert db.get_open_entry() is None
+    assert [(e.check_in, e.check_out, e.hours) for e in db.get_entries('2024-05-06', '2024-05-06')] == [(480, 750, 4.5)]
+
+def test_undo_clock_in_removes_open_entry():
+    db = Database(':memory:')
+    db.clock_in(datetime(2024, 5, 6, 8, 0))
+    db.undo()
+    assert db.get_open_entry() is None
+    assert db.get_entries('2024-05-06', '2024-05-06') == []
+
+def test_clock_out_past_midnight_splits_at_24_00():
+    db = Database(':memory:')
+    db.clock_in(datetime(2024, 5, 6, 22, 0))
+    assert db.clock_out(datetime(2024, 5, 7, 1, 0)) == 3.0
+    entries = db.get_entries('2024-05-06', '2024-05-07')
+    assert [(e.date, e.check_in, e.check_out) for e in entries] == [
+        (datetime(2024, 5, 6).toordinal(), 1320, 1440),
+        (datetime(2024, 5, 7).toordinal(), 0, 60),
+    ]
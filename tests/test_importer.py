@@ -0,0 +1,55 @@
+# tests/test_importer.py
+from database import Database
+from importer import import_file
+
+def entries(db, day):
+    return [(e.check_in, e.check_out, e.type, e.hours) for e in db.get_entries(day, day)]
+
+def test_csv_rejects_bad_rows_and_imports_the_rest(tmp_path):
+    path = tmp_path / 'entries.csv'
+    path.write_text('date,check_in,check_out,type,hours\n'
+                    '2024-05-06,08:00,12:00,,\n'
+                    '2024-05-32,08:00,12:00,,\n'
+                    '2024-05-07,12:00,08:00,,\n'
+                    '2024-05-07,,,Vacation,-2\n'
+                    '07.05.2024,,,Vacation,7.5\n', encoding='utf-8')
+    db = Database(':memory:')
+    stats = import_file(db, str(path))
+    assert (stats.read, stats.imported, stats.rejected) == (5, 2, 3)
+    assert [row for row, _ in stats.errors] == [2, 3, 4]
+    assert entries(db, '2024-05-06') == [(480, 720, 'Working', 4.0)]
+    assert entries(db, '2024-05-07') == [(None, None, 'Vacation', 7.5)]
+
+def test_json_lines_rejects_a_malformed_line(tmp_path):
+    path = tmp_path / 'entries.jsonl'
+    path.write_text('{"date": "2024-05-06", "check_in": "08:00", "check_out": "12:00"}\n'
+                    '{"date": "2024-05-07", "check_in": \n'
+                    '{"date": "2024-05-08", "check_in": "09:00", "check_out": "10:00"}\n', encoding='utf-8')
+    db = Database(':memory:')
+    stats = import_file(db, str(path))
+    assert (stats.imported, stats.rejected) == (2, 1)
+    assert stats.errors[0][0] == 2 and stats.errors[0][1].startswith('invalid JSON')
+    assert entries(db, '2024-05-08') == [(540, 600, 'Working', 1.0)]
+
+def test_json_array_rejects_non_object_items(tmp_path):
+    path = tmp_path / 'entries.json'
+    path.write_text('[{"date": "2024-05-06", "check_in": "08:00", "check_out": "12:00"}, 5, "x", null]',
+                    encoding='utf-8')
+    db = Database(':memory:')
+    stats = import_file(db, str(path))
+    assert (stats.imported, stats.rejected) == (1, 3)
+    assert stats.errors[0] == (2, 'expected an object, got int')
+
+def test_rows_on_archived_days_are_rejected(tmp_path):
+    path = tmp_path / 'entries.csv'
+    path.write_text('date,check_in,check_out\n'
+                    '2024-01-15,08:00,12:00\n'
+                    '2024-02-01,08:00,12:00\n', encoding='utf-8')
+    db = Database(':memory:')
+    db.add_entry('2024-01-02', '08:00', '16:00', 'Working', 8, True)
+    db.archive('2024-01-31')
+    stats = import_file(db, str(path))
+    assert (stats.imported, stats.rejected) == (1, 1)
+    assert stats.errors == [(1, '2024-01-15 is archived and cannot be changed')]
+    assert entries(db, '2024-02-01') == [(480, 720, 'Working', 4.0)]
+    assert entries(db, '2024-01-15') == []
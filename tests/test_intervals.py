@@ -0,0 +1,92 @@
+# tests/test_intervals.py
+from intervals import DayIntervals
+
+DAY = 739000
+
+def rows(*spans):
+    # (id, start, end) -> loaded rows of type Working
+    return [(entry_id, start, end, 'Working', (end - start) / 60, False) for entry_id, start, end in spans]
+
+def spans(day):
+    return [(item.id, item.start, item.end) for item in day]
+
+def assert_disjoint(day):
+    items = list(day)
+    assert all(a.end <= b.start for a, b in zip(items, items[1:])), spans(day)
+
+def test_insert_trims_and_splits():
+    day = DayIntervals(DAY, rows((1, 420, 495), (2, 510, 585)))
+    day.insert(480, 540, 'Working', 1.0, False)
+    assert spans(day) == [(1, 420, 480), (None, 480, 540), (2, 540, 585)]
+    assert sorted(day.changes(), key=str) == sorted([
+        ('update', 1, (DAY, 420, 480, 'Working', 1.0, False)),
+        ('update', 2, (DAY, 540, 585, 'Working', 0.75, False)),
+        ('insert', (DAY, 480, 540, 'Working', 1.0, False)),
+    ], key=str)
+
+def test_insert_inside_splits_one_row():
+    day = DayIntervals(DAY, rows((1, 480, 960)))
+    day.insert(600, 660, 'Vacation', 1.0, False)
+    assert spans(day) == [(1, 480, 600), (None, 600, 660), (None, 660, 960)]
+
+def test_insert_covering_deletes():
+    day = DayIntervals(DAY, rows((1, 480, 540), (2, 600, 660)))
+    day.insert(400, 700, 'Working', 5.0, False)
+    assert spans(day) == [(None, 400, 700)]
+    assert {change for change in day.changes() if change[0] == 'delete'} == {('delete', 1), ('delete', 2)}
+
+def test_touching_rows_are_kept():
+    day = DayIntervals(DAY, rows((1, 480, 540), (2, 600, 660)))
+    day.insert(540, 600, 'Working', 1.0, False)
+    assert spans(day) == [(1, 480, 540), (None, 540, 600), (2, 600, 660)]
+    assert day.changes() == [('insert', (DAY, 540, 600, 'Working', 1.0, False))]
+
+def test_split_and_find():
+    day = DayIntervals(DAY, rows((1, 480, 960)))
+    day.split(720)
+    assert spans(day) == [(1, 480, 720), (None, 720, 960)]
+    assert day.find(719).id == 1
+    assert day.find(720).id is None
+    assert day.find(960) is None
+
+def test_remove_and_move():
+    day = DayIntervals(DAY, rows((1, 480, 540), (2, 600, 660)))
+    day.remove(1)
+    day.remove(2, record=False)
+    assert spans(day) == []
+    # A detached row is neither deleted nor updated here
+    assert day.changes() == [('delete', 1)]
+
+def test_reinsert_keeps_id():
+    day = DayIntervals(DAY, rows((1, 480, 540), (2, 600, 660)))
+    day.remove(1, record=False)
+    day.insert(630, 700, 'Working', 70 / 60, False, entry_id=1)
+    assert spans(day) == [(2, 600, 630), (1, 630, 700)]
+    assert ('update', 1, (DAY, 630, 700, 'Working', 70 / 60, False)) in day.changes()
+
+def test_overlapping_rows_are_all_resolved():
+    # Stored rows may overlap each other; a later row must still clear every row it reaches
+    day = DayIntervals(DAY, rows((1, 480, 720), (2, 540, 570), (3, 600, 840)))
+    day.insert(660, 690, 'Working', 0.5, False)
+    assert [s for s in spans(day) if s[1] < 690 and s[2] > 660] == [(None, 660, 690)]
+    # Rows the new entry does not reach stay as they are
+    assert (2, 540, 570) in spans(day)
+    assert (1, 480, 660) in spans(day) and (3, 600, 660) in spans(day)
+    assert [item.start for item in day] == sorted(item.start for item in day)
+
+def test_overlapping_rows_find_and_split():
+    day = DayIntervals(DAY, rows((1, 480, 720), (2, 540, 570)))
+    assert day.find(600).id == 1
+    day.split(600)
+    assert spans(day) == [(1, 480, 600), (2, 540, 570), (None, 600, 720)]
+
+def test_overlapping_rows_remove_same_start():
+    day = DayIntervals(DAY, rows((1, 480, 720), (2, 480, 540)))
+    assert day.remove(2).id == 2
+    assert spans(day) == [(1, 480, 720)]
+
+def test_clear_full_day_leaves_nothing():
+    day = DayIntervals(DAY, rows((1, 0, 300), (2, 200, 600), (3, 900, 1440)))
+    day.clear(0, 1440)
+    assert spans(day) == []
+    assert_disjoint(day)
@@ -0,0 +1,76 @@
+# tests/test_journal.py
+import pytest
+
+from database import Database
+
+DAY = 739000
+
+def state(db):
+    return [(e.check_in, e.check_out, e.type, e.hours) for e in db.get_entries(DAY, DAY + 1)]
+
+def uids(db):
+    return sorted(row[0] for row in db.conn.execute('SELECT uid FROM work_entries'))
+
+@pytest.fixture
+def db():
+    db = Database(':memory:')
+    db.add_entry(DAY, 480, 960, 'Working', 8.0, True)          # op 1
+    db.add_entry(DAY, 600, 660, 'Vacation', 1.0, False)        # op 2: splits the first entry
+    db.add_entry(DAY + 1, None, None, 'Sick Leave', 7.5, False)  # op 3
+    return db
+
+AFTER_1 = [(480, 960, 'Working', 8.0)]
+AFTER_2 = [(480, 600, 'Working', 2.0), (600, 660, 'Vacation', 1.0), (660, 960, 'Working', 5.0)]
+AFTER_3 = AFTER_2 + [(None, None, 'Sick Leave', 7.5)]
+
+def test_undo_and_redo_step_through_operations(db):
+    assert state(db) == AFTER_3
+    assert db.undo() == 3 and state(db) == AFTER_2
+    assert db.undo() == 2 and state(db) == AFTER_1
+    assert db.undo() == 1 and state(db) == []
+    assert db.undo() is None and not db.can_undo()
+    assert db.redo() == 1 and state(db) == AFTER_1
+    assert db.redo() == 2 and state(db) == AFTER_2
+    assert db.redo() == 3 and state(db) == AFTER_3
+    assert db.redo() is None and not db.can_redo()
+
+def test_redo_restores_rows_by_uid(db):
+    before = uids(db)
+    db.undo()
+    db.undo()
+    db.redo()
+    db.redo()
+    assert uids(db) == before
+    assert db.get_daily_totals(DAY, DAY + 1) == [(DAY, 7.0, 1.0, 0.5), (DAY + 1, 0.0, 7.5, 0.0)]
+
+def test_new_write_discards_redo_history(db):
+    db.undo()
+    db.undo()
+    assert db.can_redo()
+    db.add_entry(DAY, 1000, 1100, 'Working', 1.0, False)
+    assert not db.can_redo() and db.redo() is None
+    assert state(db) == AFTER_1 + [(1000, 1100, 'Working', 1.0)]
+    assert [(op.id, op.state) for op in db.get_journal()] == [(4, 'done'), (3, 'discarded'), (2, 'discarded'), (1, 'done')]
+    with pytest.raises(ValueError):
+        db.revert_to(2)
+
+def test_revert_to_moves_both_ways(db):
+    db.revert_to(1)
+    assert state(db) == AFTER_1
+    assert [op.state for op in db.get_journal()] == ['undone', 'undone', 'done']
+    db.revert_to(3)
+    assert state(db) == AFTER_3
+    db.revert_to(0)
+    assert state(db) == [] and not db.can_undo()
+    db.revert_to(2)
+    assert state(db) == AFTER_2 and db.can_redo()
+
+def test_operations_are_per_user(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    ann, bob = Database(path, user_id='ann'), Database(path, user_id='bob')
+    ann.add_entry(DAY, 480, 960, 'Working', 8.0, True)
+    bob.add_entry(DAY, 600, 700, 'Working', 1.0, False)
+    assert ann.undo() is not None and state(ann) == []
+    assert state(bob) == [(600, 700, 'Working', 1.0)] and not bob.can_redo()
+    ann.close()
+    bob.close()
@@ -0,0 +1,69 @@
+# tests/test_migrations.py
+import sqlite3
+from datetime import date
+
+from database import DEFAULT_USER, SCHEMA_VERSION, Database, Entry
+
+MAY_6 = date(2024, 5, 6).toordinal()
+MAY_7 = date(2024, 5, 7).toordinal()
+
+def build_v0(path):
+    # The schema and rows of the original release: text dates and times, one user, no version
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE work_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            check_in TEXT,
+            check_out TEXT,
+            type TEXT NOT NULL,
+            hours REAL NOT NULL,
+            lunch_break BOOLEAN NOT NULL DEFAULT 1
+        );
+        CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT);
+        INSERT INTO work_entries (date, check_in, check_out, type, hours, lunch_break) VALUES
+            ('2024-05-06', '08:00', '12:00', 'Working', 4.0, 0),
+            ('2024-05-06', '12:30', '18:00', 'Working', 5.5, 1),
+            ('2024-05-07', NULL, NULL, 'Vacation', 7.5, 0),
+            ('2024-05-07', '16:15:00', '17:00', 'Sick Leave', 0.75, 0);
+        INSERT INTO settings (key, value) VALUES ('start_date', '2024-05-06'), ('time_scale', '0:0.2,7:0.6,18:0.2');
+    ''')
+    conn.commit()
+    conn.close()
+
+def test_v0_database_is_migrated(tmp_path):
+    path = str(tmp_path / 'work_hours.db')
+    build_v0(path)
+    with Database(path) as db:
+        assert db.conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert db.get_entries(MAY_6, MAY_7) == [
+            Entry(1, MAY_6, 480, 720, 'Working', 4.0, 0),
+            Entry(2, MAY_6, 750, 1080, 'Working', 5.5, 1),
+            Entry(3, MAY_7, None, None, 'Vacation', 7.5, 0),
+            Entry(4, MAY_7, 975, 1020, 'Sick Leave', 0.75, 0),
+        ]
+        assert db.get_daily_totals(MAY_6, MAY_7) == [(MAY_6, 9.5, 0.0, 2.0), (MAY_7, 0.0, 8.25, 0.75)]
+        assert db.get_settings() == {'start_date': '2024-05-06', 'time_scale': '0:0.2,7:0.6,18:0.2'}
+        assert db.conn.execute('SELECT DISTINCT user_id FROM work_entries').fetchall() == [(DEFAULT_USER,)]
+        # Migrated rows are writable like new ones: totals follow and overlaps resolve
+        db.add_entry(MAY_6, '11:00', '13:00', 'Working', 2.0, False)
+        assert [(e.check_in, e.check_out) for e in db.get_entries(MAY_6, MAY_6)] == [(480, 660), (660, 780), (780, 1080)]
+        assert db.get_daily_totals(MAY_6, MAY_6) == [(MAY_6, 10.0, 0.0, 2.5)]
+    assert Database(path, user_id='alice').get_settings() == {}
+
+def test_migrated_database_is_not_migrated_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'work_hours.db')
+    build_v0(path)
+    Database(path).close()
+
+    def fail(self, cursor):
+        raise AssertionError("migrated twice")
+    for version in range(1, SCHEMA_VERSION + 1):
+        monkeypatch.setattr(Database, f'_migrate_to_v{version}', fail)
+    with Database(path) as db:
+        assert len(db.get_entries(MAY_6, MAY_7)) == 4
+
+def test_new_database_starts_at_current_version(tmp_path):
+    with Database(str(tmp_path / 'new.db')) as db:
+        assert db.conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert db.get_entries(MAY_6, MAY_7) == []
@@ -0,0 +1,20 @@
+# tests/test_schedules.py
+import pytest
+
+from database import Database
+from schedules import materialize, parse_slot
+
+def test_overlapping_slots_are_rejected():
+    db = Database(':memory:')
+    with pytest.raises(ValueError, match='Overlapping slots'):
+        db.save_template('t', parse_slot('mon=08:00-12:00') + parse_slot('mon-tue=08:00-10:00'))
+    with pytest.raises(ValueError, match='Overlapping slots'):
+        db.save_template('t', parse_slot('wed=08:00-12:00') + parse_slot('wed=11:00-13:00'))
+    assert db.get_template('t') is None
+
+def test_touching_slots_materialize_per_weekday():
+    db = Database(':memory:')
+    db.save_template('t', parse_slot('mon-fri=08:00-12:00') + parse_slot('mon=12:00-13:00=Vacation'))
+    assert materialize(db, 't', '2024-05-06', '2024-05-12') == 6
+    monday = db.get_entries('2024-05-06', '2024-05-06')
+    assert [(e.check_in, e.check_out, e.type) for e in monday] == [(480, 720, 'Working'), (720, 780, 'Vacation')]
@@ -0,0 +1,53 @@
+# tests/test_sync.py
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from database import Database
+from sync import SyncClient, SyncServer
+
+ROW = {'uid': 'a' * 32, 'date': 739000, 'check_in': 480, 'check_out': 960,
+       'type': 'Working', 'hours': 8.0, 'lunch_break': 1}
+
+@pytest.fixture
+def server(tmp_path):
+    server = SyncServer(str(tmp_path / 'server.db'), port=0)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def post(server, changes):
+    request = urllib.request.Request(server.url + '/changes', method='POST',
+                                     data=json.dumps({'user': 'ann', 'changes': changes}).encode('utf-8'))
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+@pytest.mark.parametrize('bad', [
+    {'date': '2024-05-01'},
+    {'check_in': '08:00'},
+    {'check_in': 960, 'check_out': 480},
+    {'check_out': 24 * 60 + 1},
+    {'hours': -3},
+    {'hours': '8'},
+    {'type': 'Overtime'},
+    {'lunch_break': 'yes'},
+])
+def test_push_rejects_invalid_rows(server, bad):
+    status, _ = post(server, [ROW, {**ROW, 'uid': 'b' * 32, **bad}])
+    assert status == 400
+    with server.pool.connection('ann') as db:
+        assert db.get_entries(739000, 739000) == []
+
+def test_push_and_pull_valid_rows(server, tmp_path):
+    assert post(server, [ROW, {**ROW, 'uid': 'b' * 32, 'date': 739001, 'check_out': None, 'hours': 0.0}]) == (200, {'applied': 2})
+    client = Database(str(tmp_path / 'client.db'), user_id='ann')
+    SyncClient(client, server.url).sync()
+    assert [(e.date, e.check_in, e.check_out) for e in client.get_entries(739000, 739000)] == [(739000, 480, 960)]
+    assert client.get_open_entry().date == 739001
+    client.close()
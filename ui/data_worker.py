@@ -0,0 +1,89 @@
+# ui/data_worker.py
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from database import DEFAULT_USER, Database
+from weeks import load_range_view, load_week
+
+class _Load(QRunnable):
+    def __init__(self, loader, request_id, load, args, signal, prefetch):
+        super(_Load, self).__init__()
+        self.loader = loader
+        self.request_id = request_id
+        self.load = load
+        self.args = args
+        self.signal = signal
+        self.prefetch = prefetch
+
+    def run(self):
+        # A newer navigation request supersedes this one before it touches the database
+        if not self.prefetch and self.request_id != self.loader.latest_request:
+            self.loader.cancelled.emit(self.request_id)
+            return
+        try:
+            result = self.load(self.loader.thread_db(), *self.args)
+        except Exception as e:
+            self.loader.failed.emit(self.request_id, str(e))
+            return
+        self.signal.emit(self.request_id, result)
+
+class WeekLoader(QObject):
+    # Loads WeekData/RangeData on a QThreadPool, each worker thread with its own SQLite
+    # connection. Results arrive on the GUI thread through week_loaded/range_loaded(request_id, data).
+    week_loaded = pyqtSignal(int, object)
+    range_loaded = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+    def __init__(self, db_path, max_threads=2, parent=None, user_id=DEFAULT_USER):
+        super(WeekLoader, self).__init__(parent)
+        self.db_path = db_path
+        self.user_id = user_id
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # Idle threads normally retire after 30 s, which would orphan their connections in
+        # _connections; kept alive instead, there are never more than max_threads connections
+        self.pool.setExpiryTimeout(-1)
+        self.latest_request = 0
+        self._next_request = 0
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def thread_db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # check_same_thread=False only so shutdown() can close it from the GUI thread
+            db = Database(self.db_path, check_same_thread=False, user_id=self.user_id)
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def _submit(self, load, args, signal, prefetch):
+        self._next_request += 1
+        if not prefetch:
+            self.latest_request = self._next_request
+        self.pool.start(_Load(self, self._next_request, load, args, signal, prefetch))
+        return self._next_request
+
+    def request(self, start_date):
+        # Only the most recent request is guaranteed to run; older pending ones are skipped
+        return self._submit(load_week, (start_date,), self.week_loaded, prefetch=False)
+
+    def prefetch(self, start_date):
+        return self._submit(load_week, (start_date,), self.week_loaded, prefetch=True)
+
+    def request_range(self, view, anchor):
+        return self._submit(load_range_view, (view, anchor), self.range_loaded, prefetch=False)
+
+    def is_current(self, request_id):
+        return request_id == self.latest_request
+
+    def shutdown(self):
+        self.latest_request = -1
+        self.pool.clear()
+        self.pool.waitForDone()
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
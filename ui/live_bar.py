@@ -0,0 +1,103 @@
+# ui/live_bar.py
+from datetime import datetime
+from matplotlib.patches import Rectangle
+from PyQt5.QtCore import QObject, Qt, QTimer
+from ui.week_plot import BAR_WIDTH, type_color
+
+# The bar grows at minute resolution, so one tick a minute is all it needs
+LIVE_TICK_MS = 60 * 1000
+
+class LiveBar(QObject):
+    # The growing bar of a running clock-in on today's column of the week chart. It is an
+    # animated artist: full draws leave it out, and each tick restores the background saved
+    # after the last full draw and blits just this rectangle, so a tick never redraws the chart.
+    # The timer runs only while an entry is open and the window is visible.
+
+    def __init__(self, canvas, ax, on_tick=None, parent=None):
+        super(LiveBar, self).__init__(parent)
+        self.canvas = canvas
+        self.ax = ax
+        self.on_tick = on_tick  # on_tick(hours): hours of today's part of the open entry
+        self.entry = None
+        self.days = ()
+        self.active = True
+        self._background = None
+        self.rect = Rectangle((0, 0), BAR_WIDTH, 0, animated=True, visible=False,
+                              edgecolor='black', hatch='//', zorder=2)
+        ax.add_patch(self.rect)
+        canvas.mpl_connect('draw_event', self._on_draw)
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.VeryCoarseTimer)
+        self.timer.setInterval(LIVE_TICK_MS)
+        self.timer.timeout.connect(self.tick)
+
+    def set_entry(self, entry):
+        # entry: the open Entry from Database.get_open_entry(), or None
+        self.entry = entry
+        if entry is not None:
+            self.rect.set_facecolor(type_color(entry.type))
+        self._update_timer()
+        self.tick()
+
+    def set_days(self, days):
+        # The dates of the displayed week's columns
+        self.days = list(days)
+        self.tick()
+
+    def set_active(self, active):
+        # False while the window is hidden or minimized: nothing is drawn, the timer stops
+        self.active = active
+        self._update_timer()
+        if active:
+            self.tick()
+
+    def _update_timer(self):
+        if self.entry is not None and self.active:
+            if not self.timer.isActive():
+                self.timer.start()
+        else:
+            self.timer.stop()
+
+    def today_hours(self, now=None):
+        # Hours of the open entry on today's date; a session started yesterday counts from 00:00
+        if self.entry is None:
+            return 0.0
+        now = now or datetime.now()
+        start = self.entry.check_in if self.entry.date == now.date().toordinal() else 0
+        return max(now.hour * 60 + now.minute - start, 0) / 60
+
+    def _place(self, now):
+        # Positions the rectangle; returns whether it is shown
+        today = now.date()
+        shown = (self.entry is not None and self.active and self.ax.get_visible()
+                 and today in self.days and self.entry.date <= today.toordinal())
+        self.rect.set_visible(shown)
+        if shown:
+            start = self.entry.check_in / 60 if self.entry.date == today.toordinal() else 0.0
+            self.rect.set_bounds(self.days.index(today) - BAR_WIDTH / 2, start, BAR_WIDTH,
+                                 now.hour + now.minute / 60 - start)
+        return shown
+
+    def _on_draw(self, event):
+        # After a full draw: save the chart without the bar, then draw the bar on top
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self._place(datetime.now()):
+            self.ax.draw_artist(self.rect)
+
+    def tick(self):
+        if not self.active:
+            return
+        now = datetime.now()
+        was_shown = self.rect.get_visible()
+        shown = self._place(now)
+        # Blitting onto a hidden axes (a range view is showing) would paint the stale week over it
+        if self._background is not None and (shown or was_shown) and self.ax.get_visible():
+            self.canvas.restore_region(self._background)
+            if shown:
+                self.ax.draw_artist(self.rect)
+            self.canvas.blit(self.ax.bbox)
+        if self.on_tick is not None and self.entry is not None:
+            self.on_tick(self.today_hours(now))
+
+    def stop(self):
+        self.timer.stop()
@@ -1,96 +1,27 @@
 # ui/main_window.py
 import sys
-import numpy as np
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QDialog, QFormLayout, QComboBox,
-    QTimeEdit, QDateEdit, QMessageBox, QInputDialog, QSpinBox, QCheckBox
+    QTimeEdit, QDateEdit, QMessageBox, QInputDialog, QSpinBox, QCheckBox, QShortcut
 )
-from PyQt5.QtCore import Qt, QDate, QTime
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
-import matplotlib.pyplot as plt
-from matplotlib.scale import ScaleBase
-from matplotlib.transforms import Transform
-from matplotlib.ticker import FixedLocator, FixedFormatter
-from matplotlib.patches import Rectangle
-from matplotlib import scale as mscale
+from PyQt5.QtCore import Qt, QDate, QEvent, QTime, QTimer
+from PyQt5.QtGui import QKeySequence
 from datetime import date, datetime, timedelta
-from database import Database
-
-class CustomTimeTransform(Transform):
-    input_dims = output_dims = 1
-    is_separable = True
-
-    def __init__(self):
-        super().__init__()
-        self.linearstart = 7
-        self.linearend = 18
-        self.ticksize1 = 0.2
-        self.ticksize2 = 0.6
-
-    def transform_non_affine(self, t):
-        t = np.asarray(t)
-        y = np.empty_like(t)
-        # Compress 00:00-07:00
-        mask = t < self.linearstart
-        y[mask] = t[mask] * self.ticksize1
-        # Normal scale for 07:00-18:00
-        mask = (t >= self.linearstart) & (t < self.linearend)
-        y[mask] = self.linearstart*self.ticksize1 + (t[mask] - self.linearstart) * self.ticksize2
-        # Compress 18:00-24:00
-        mask = t >= self.linearend
-        y[mask] = self.linearstart*self.ticksize1 + (self.linearend-self.linearstart)*self.ticksize2 + (t[mask] - self.linearend) * self.ticksize1
-        return y
-
-    def inverted(self):
-        return InvertedCustomTimeTransform(self.linearstart, self.linearend, self.ticksize1, self.ticksize2)
-
-class InvertedCustomTimeTransform(Transform):
-    input_dims = output_dims = 1
-    is_separable = True
-
-    def __init__(self, linearstart, linearend, ticksize1, ticksize2):
-        super().__init__()
-        self.linearstart = linearstart
-        self.linearend = linearend
-        self.ticksize1 = ticksize1
-        self.ticksize2 = ticksize2
-
-    def transform_non_affine(self, y):
-        y = np.asarray(y)
-        t = np.empty_like(y)
-        # Inverse for 00:00-07:00
-        mask = y < self.linearstart * self.ticksize1
-        t[mask] = y[mask] / self.ticksize1
-        # Inverse for 07:00-18:00
-        mask = (y >= self.linearstart * self.ticksize1) & (y < self.linearstart * self.ticksize1 + (self.linearend - self.linearstart) * self.ticksize2)
-        t[mask] = self.linearstart + (y[mask] - self.linearstart * self.ticksize1) / self.ticksize2
-        # Inverse for 18:00-24:00
-        mask = y >= self.linearstart * self.ticksize1 + (self.linearend - self.linearstart) * self.ticksize2
-        t[mask] = self.linearend + (y[mask] - (self.linearstart * self.ticksize1 + (self.linearend - self.linearstart) * self.ticksize2)) / self.ticksize1
-        return t
-
-    def inverted(self):
-        return CustomTimeTransform()
-
-class CustomTimeScale(ScaleBase):
-    name = 'custom_time'
-
-    def __init__(self, axis, **kwargs):
-        super().__init__(axis, **kwargs)
-        self.axis = axis
-
-    def get_transform(self):
-        return CustomTimeTransform()
-
-    def set_default_locators_and_formatters(self, axis):
-        major_times = np.arange(0, 25, 2)
-        axis.set_major_locator(FixedLocator(major_times))
-        axis.set_major_formatter(FixedFormatter([f"{int(t):02d}:00" for t in major_times]))
-
-# Register the custom scale
-mscale.register_scale(CustomTimeScale)
+from database import DAILY_NORM_HOURS, DEFAULT_USER, ENTRY_TYPES, Database, default_lunch_break
+from instrumentation import logger as perf_logger, perf
+from settings import Settings
+from ui.startup import StartupProfiler
+
+# Debounce interval of settings writes
+SETTINGS_FLUSH_MS = 1000
+
+# QTime has no 24:00, so a check-out of 00:00 stands for the midnight that ends the day
+MIDNIGHT_TOOLTIP = "00:00 is midnight at the end of the day"
+
+def check_out_minutes(time_edit):
+    minutes = time_edit.time().hour() * 60 + time_edit.time().minute()
+    return minutes or 24 * 60
 
 class AddEntryDialog(QDialog):
     def __init__(self, parent=None, preset_date=None):
@@ -110,12 +41,13 @@ class AddEntryDialog(QDialog):
 
 
         self.type_combo = QComboBox(self)
-        self.type_combo.addItems(["Working", "Sick Leave", "Vacation"])
+        self.type_combo.addItems(ENTRY_TYPES)
 
         self.check_in = QTimeEdit(self)
         self.check_in.setTime(QTime(8, 0))
         self.check_out = QTimeEdit(self)
         self.check_out.setTime(QTime(16, 00))
+        self.check_out.setToolTip(MIDNIGHT_TOOLTIP)
 
         self.layout.addRow("Date:", self.date_edit)
         self.layout.addRow("Type:", self.type_combo)
@@ -146,12 +78,14 @@ class EditEntryDialog(QDialog):
         self.date_edit.setDate(QDate(date.year, date.month, date.day))
 
         self.check_in = QTimeEdit(self)
-        self.check_in.setTime(QTime(int(start_time), int((start_time % 1) * 60)))
+        # start_time/end_time are minutes since midnight
+        self.check_in.setTime(QTime(*divmod(start_time, 60)))
         self.check_out = QTimeEdit(self)
-        self.check_out.setTime(QTime(int(end_time), int((end_time % 1) * 60)))
+        self.check_out.setTime(QTime(*divmod(end_time % (24 * 60), 60)))
+        self.check_out.setToolTip(MIDNIGHT_TOOLTIP)
 
         self.type_combo = QComboBox(self)
-        self.type_combo.addItems(["Working", "Sick Leave", "Vacation"])
+        self.type_combo.addItems(ENTRY_TYPES)
         self.type_combo.setCurrentText(entry_type)
 
         self.lunch_break_label = QLabel("Lunch Break:")
@@ -199,10 +133,12 @@ class EditEntryDialog(QDialog):
         self.delete_entry = True
         self.accept()
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler=None, user_id=DEFAULT_USER):
         super(MainWindow, self).__init__()
-        self.db = Database()
-        self.setWindowTitle("Work Hours Tracker")
+        self.profiler = profiler or StartupProfiler()
+        self.user_id = user_id
+        self.db = None
+        self.setWindowTitle("Work Hours Tracker" if user_id == DEFAULT_USER else f"Work Hours Tracker - {user_id}")
         self.setGeometry(100, 100, 1000, 700)
 
         self.central_widget = QWidget()
@@ -214,12 +150,26 @@ class MainWindow(QMainWindow):
         self.top_layout = QHBoxLayout()
         self.add_entry_btn = QPushButton("Add Entry")
         self.set_start_date_btn = QPushButton("Set Start Date")
+        self.apply_template_btn = QPushButton("Apply Template")
+        self.clock_btn = QPushButton("Clock In")
+        self.undo_btn = QPushButton("Undo")
+        self.redo_btn = QPushButton("Redo")
         self.top_layout.addWidget(self.add_entry_btn)
         self.top_layout.addWidget(self.set_start_date_btn)
+        self.top_layout.addWidget(self.apply_template_btn)
+        self.top_layout.addWidget(self.clock_btn)
+        self.top_layout.addWidget(self.undo_btn)
+        self.top_layout.addWidget(self.redo_btn)
         self.main_layout.addLayout(self.top_layout)
 
         self.add_entry_btn.clicked.connect(self.open_add_entry_dialog)
         self.set_start_date_btn.clicked.connect(self.set_start_date)
+        self.apply_template_btn.clicked.connect(self.apply_template)
+        self.clock_btn.clicked.connect(self.toggle_clock)
+        self.undo_btn.clicked.connect(self.undo)
+        self.redo_btn.clicked.connect(self.redo)
+        QShortcut(QKeySequence.Undo, self, self.undo)
+        QShortcut(QKeySequence.Redo, self, self.redo)
 
         # Week navigation
         self.week_layout = QHBoxLayout()
@@ -234,22 +184,24 @@ class MainWindow(QMainWindow):
         self.week_layout.addWidget(self.week_label)
         self.week_layout.addWidget(self.week_spinbox)
         self.week_layout.addWidget(self.next_week_btn)
+        self.view_combo = QComboBox()
+        # The range views are added by finish_startup, with the numpy-backed weeks module
+        self.view_combo.addItem("Week")
+        self.week_layout.addWidget(self.view_combo)
+        self.view = "Week"
         
         self.main_layout.insertLayout(1, self.week_layout)  # Insert after top buttons
 
         self.prev_week_btn.clicked.connect(self.previous_week)
         self.next_week_btn.clicked.connect(self.next_week)
         self.week_spinbox.valueChanged.connect(self.week_changed)
+        self.view_combo.currentTextChanged.connect(self.view_changed)
 
-        # Matplotlib Figure
-        self.figure, self.ax = plt.subplots(figsize=(10, 8))
-        self.canvas = FigureCanvas(self.figure)
-        #self.toolbar = NavigationToolbar(self.canvas, self)
-        #self.main_layout.addWidget(self.toolbar)
-        self.main_layout.addWidget(self.canvas)
-
-        # Connect the click event
-        self.canvas.mpl_connect('button_press_event', self.on_plot_click)
+        # The plot area is filled in by finish_startup once the event loop is running
+        self.canvas = None
+        self.canvas_placeholder = QLabel("Loading...")
+        self.canvas_placeholder.setAlignment(Qt.AlignCenter)
+        self.main_layout.addWidget(self.canvas_placeholder, 1)
 
         # Extra Hours Display
         self.extra_hours_label = QLabel("Extra Hours: 0")
@@ -257,67 +209,144 @@ class MainWindow(QMainWindow):
         self.extra_hours_label.setStyleSheet("font-size: 16px;")
         self.main_layout.addWidget(self.extra_hours_label)
 
-        self.set_current_week()
-        self.load_data()
+        # Controls need the database, so they stay disabled until it is open
+        self.central_widget.setEnabled(False)
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        # Deferred so the window shell paints before matplotlib and SQLite are loaded
+        with self.profiler.phase("import matplotlib"):
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+            from ui import time_scale
+            from ui.week_plot import WeekPlot
+            from ui.live_bar import LiveBar
+            # weeks and schedules import numpy, so they load here rather than at module import
+            from ui.data_worker import WeekLoader
+            from weeks import RANGE_VIEWS, WeekCache
+
+        with self.profiler.phase("canvas setup"):
+            time_scale.register()
+            self.view_combo.addItems(RANGE_VIEWS)
+            # Figure directly, without pyplot's global figure manager
+            self.figure = Figure(figsize=(10, 8))
+            self.ax = self.figure.add_subplot()
+            self.canvas = FigureCanvas(self.figure)
+            self.main_layout.replaceWidget(self.canvas_placeholder, self.canvas)
+            self.canvas_placeholder.deleteLater()
+            self.week_plot = WeekPlot(self.ax)
+            self._layout_done = False
+            self.live_bar = LiveBar(self.canvas, self.ax, on_tick=self.update_live_label, parent=self)
+            self.shown_week = None
+            self.live_base_hours = 0.0  # Recorded hours of today, without the open entry
+
+            # Connect the click event
+            self.canvas.mpl_connect('button_press_event', self.on_plot_click)
+            self._first_draw = self.canvas.mpl_connect('draw_event', self.on_first_draw)
+
+            self.perf_overlay = None
+            if perf.enabled:
+                from ui.perf_overlay import PerfOverlay
+                perf.wrap(self, 'load_data', 'load_data')
+                perf.wrap(self.canvas, 'draw', 'canvas.draw')
+                self.perf_overlay = PerfOverlay(self.canvas)
+                # draw_event fires inside draw(); refresh once the canvas.draw span has closed
+                self.canvas.mpl_connect('draw_event', lambda event: QTimer.singleShot(0, self.perf_overlay.refresh))
+                QShortcut(QKeySequence(Qt.Key_F12), self, self.toggle_perf_overlay)
+
+        with self.profiler.phase("open database"):
+            self.db = Database(user_id=self.user_id)
+            # Settings changes reach the database at most once per SETTINGS_FLUSH_MS
+            self.settings_timer = QTimer(self)
+            self.settings_timer.setSingleShot(True)
+            self.settings_timer.setInterval(SETTINGS_FLUSH_MS)
+            self.settings = Settings(self.db, schedule_flush=self.settings_timer.start)
+            self.settings_timer.timeout.connect(self.settings.flush)
+            # Optional 'time_scale' setting, e.g. "0:0.6,6:0.2,22:0.6" stretches a night shift
+            try:
+                self.time_breakpoints = (time_scale.parse_breakpoints(self.settings.get("time_scale"))
+                                         or time_scale.DEFAULT_BREAKPOINTS)
+            except ValueError:
+                self.time_breakpoints = time_scale.DEFAULT_BREAKPOINTS
+            if self.time_breakpoints != time_scale.DEFAULT_BREAKPOINTS:
+                self.ax.set_yscale('custom_time', breakpoints=self.time_breakpoints)
+            self.week_cache = WeekCache(self.db)
+            # Every committed write can change what there is to undo or redo
+            self.db.add_listener(lambda dates: self.update_undo_buttons())
+            self.update_undo_buttons()
+            self.week_loader = WeekLoader(self.db.db_path, parent=self, user_id=self.user_id)
+            self.week_loader.week_loaded.connect(self.on_week_loaded)
+            self.week_loader.failed.connect(self.on_week_failed)
+            self.week_loader.cancelled.connect(self.on_week_cancelled)
+            self.week_loader.range_loaded.connect(self.on_range_loaded)
+            self.range_ax = self.range_plot = None
+            self.range_anchor = None
+            self.displayed_start = None
+            self.request_versions = {}
+
+        with self.profiler.phase("first data load"):
+            self.set_open_entry(self.db.get_open_entry())
+            self.set_current_week()
+            self.load_data()
+        self.central_widget.setEnabled(True)
+
+    def toggle_perf_overlay(self):
+        self.perf_overlay.setVisible(not self.perf_overlay.isVisible())
+        self.perf_overlay.refresh()
+
+    def on_first_draw(self, event):
+        self.canvas.mpl_disconnect(self._first_draw)
+        self.profiler.report()
 
     def set_current_week(self):
         today = date.today()
         current_week = today.isocalendar()[1]
         self.week_spinbox.setValue(current_week)
         start_of_week = today - timedelta(days=today.weekday())
-        self.db.set_setting("start_date", start_of_week.strftime("%Y-%m-%d"))
+        # Navigation state: kept in memory and written back on close
+        self.settings.set_date("start_date", start_of_week, persist=False)
 
     def on_plot_click(self, event):
-        if event.inaxes == self.ax:
+        if self.range_ax is not None and event.inaxes == self.range_ax:
+            # Clicking a day in a range view opens the week containing it
+            clicked_date = self.range_plot.data.start_date + timedelta(days=int(event.xdata + 0.5))
+            self.displayed_start = clicked_date - timedelta(days=clicked_date.weekday())
+            self.view_combo.setCurrentText("Week")
+            return
+        if event.inaxes == self.ax and self.week_plot.week is not None:
             day_index = int(event.xdata + 0.5)  # Round to nearest integer
             if 0 <= day_index < 7:
-                start_date = datetime.strptime(self.db.get_setting("start_date"), "%Y-%m-%d").date()
-                clicked_date = start_date + timedelta(days=day_index)
-                
+                clicked_date = self.week_plot.week.days[day_index]
+
                 # Check if we clicked on an existing bar
-                for artist in self.ax.get_children():
-                    if isinstance(artist, Rectangle) and artist.get_x() == day_index - 0.3:  # -0.3 because bar width is 0.6
-                        if artist.contains(event)[0]:
-                            # We clicked on an existing bar
-                            start_time = artist.get_y()
-                            end_time = start_time + artist.get_height()
-                            self.open_edit_entry_dialog(clicked_date, start_time, end_time)
-                            return
+                hit = self.week_plot.hit_test(event.xdata, event.ydata)
+                if hit:
+                    self.open_edit_entry_dialog(clicked_date, hit[1])
+                    return
 
                 # If we didn't click on a bar, open the add entry dialog
                 self.open_add_entry_dialog(clicked_date)
 
-    def open_edit_entry_dialog(self, date, start_time, end_time):
-        entry = self.db.get_entry(date.strftime("%Y-%m-%d"), f"{int(start_time):02d}:{int((start_time % 1) * 60):02d}")
-        if entry:
-            entry_type = entry[4]
-            lunch_break = entry[6]
-        else:
-            entry_type = "Working"
-            lunch_break = False
-        dialog = EditEntryDialog(self, date, start_time, end_time, entry_type, lunch_break)
+    def open_edit_entry_dialog(self, date, period):
+        # period comes from the hit-test index and carries the row id
+        dialog = EditEntryDialog(self, date, period.start, period.end, period.type, period.lunch_break)
         if dialog.exec_() == QDialog.Accepted:
-            if dialog.delete_entry:
-                print("main_window says delete")
-                self.db.delete_entry(
-                    date.strftime("%Y-%m-%d"),
-                    f"{int(start_time):02d}:{int((start_time % 1) * 60):02d}",
-                    f"{int(end_time):02d}:{int((end_time % 1) * 60):02d}"
-                )
-            else:
-                new_date = dialog.date_edit.date().toString("yyyy-MM-dd")
-                new_check_in = dialog.check_in.time().toString("HH:mm")
-                new_check_out = dialog.check_out.time().toString("HH:mm")
-                new_hours = (dialog.check_out.time().hour() - dialog.check_in.time().hour()) + \
-                            (dialog.check_out.time().minute() - dialog.check_in.time().minute()) / 60
-                new_type = dialog.type_combo.currentText()
-                new_lunch_break = dialog.lunch_break_checkbox.isChecked() if new_type == "Working" else False
-                self.db.update_entry(
-                    date.strftime("%Y-%m-%d"),
-                    f"{int(start_time):02d}:{int((start_time % 1) * 60):02d}",
-                    f"{int(end_time):02d}:{int((end_time % 1) * 60):02d}",
-                    new_date, new_check_in, new_check_out, new_type, new_hours, new_lunch_break
-                )
+            try:
+                if dialog.delete_entry:
+                    self.db.delete_entry_by_id(period.id)
+                else:
+                    new_date = dialog.date_edit.date().toString("yyyy-MM-dd")
+                    new_check_in = dialog.check_in.time().hour() * 60 + dialog.check_in.time().minute()
+                    new_check_out = check_out_minutes(dialog.check_out)
+                    new_hours = (new_check_out - new_check_in) / 60
+                    new_type = dialog.type_combo.currentText()
+                    new_lunch_break = dialog.lunch_break_checkbox.isChecked() if new_type == "Working" else False
+                    self.db.update_entry_by_id(
+                        period.id, new_date, new_check_in, new_check_out, new_type, new_hours, new_lunch_break
+                    )
+            except ValueError as e:
+                # Invalid times, or archived history, which cannot be changed
+                QMessageBox.warning(self, "Entry Not Changed", str(e))
             self.load_data()
 
     def open_add_entry_dialog(self, preset_date=None):
@@ -327,159 +356,257 @@ class MainWindow(QMainWindow):
         if dialog.exec_() == QDialog.Accepted:
             date = dialog.date_edit.date().toString("yyyy-MM-dd")
             entry_type = dialog.type_combo.currentText()
-            check_in = dialog.check_in.time().toString("HH:mm")
-            check_out = dialog.check_out.time().toString("HH:mm")
-            fmt = "%H:%M"
+            check_in = dialog.check_in.time().hour() * 60 + dialog.check_in.time().minute()
+            check_out = check_out_minutes(dialog.check_out)
+            if check_out <= check_in:
+                QMessageBox.warning(self, "Invalid Time", "Check-out time must be after check-in time.")
+                return
+            hours = (check_out - check_in) / 60
+
+            lunch_break = default_lunch_break(entry_type, hours)
             try:
-                t_in = datetime.strptime(check_in, fmt)
-                t_out = datetime.strptime(check_out, fmt)
-                if t_out <= t_in:
-                    QMessageBox.warning(self, "Invalid Time", "Check-out time must be after check-in time.")
-                    return
-                hours = (t_out - t_in).seconds / 3600
-            except ValueError:
-                QMessageBox.warning(self, "Invalid Time", "Please enter valid check-in and check-out times.")
+                self.db.add_entry(date, check_in, check_out, entry_type, hours, lunch_break)
+            except ValueError as e:
+                QMessageBox.warning(self, "Entry Not Added", str(e))
                 return
-            
-            # Automatically set lunch_break to True for working sessions over 5 hours
-            if entry_type == "Working" and hours > 5:
-                lunch_break = True
-            else:
-                lunch_break = False
-            
-            self.db.add_entry(date, check_in, check_out, entry_type, hours, lunch_break)
             self.load_data()
 
     def set_start_date(self):
         date, ok = QInputDialog.getText(self, 'Set Start Date', 'Enter start date (YYYY-MM-DD):')
         if ok:
             try:
-                datetime.strptime(date, "%Y-%m-%d")
-                self.db.set_setting("start_date", date)
+                start_date = datetime.strptime(date, "%Y-%m-%d").date()
+                self.settings.set_date("start_date", start_date)
                 self.load_data()
             except ValueError:
                 QMessageBox.warning(self, "Invalid Date", "Please enter a valid date in YYYY-MM-DD format.")
 
+    def apply_template(self):
+        # Fills the displayed week from a schedule template (defined with `cli.py template`)
+        names = self.db.get_template_names()
+        if not names:
+            QMessageBox.information(self, "No Templates", "Define a template first, e.g.\n"
+                                    "python cli.py template Standard mon-fri=08:00-16:00")
+            return
+        name, ok = QInputDialog.getItem(self, "Apply Template", "Template for this week:", names, 0, False)
+        if not ok:
+            return
+        from schedules import materialize
+        start = self.displayed_start
+        try:
+            materialize(self.db, name, start, start + timedelta(days=6))
+        except ValueError as e:
+            QMessageBox.warning(self, "Template Not Applied", str(e))
+            return
+        self.load_data()
+
+    def toggle_clock(self):
+        try:
+            if self.live_bar.entry is not None:
+                self.db.clock_out()
+            else:
+                self.db.clock_in()
+        except ValueError as e:
+            QMessageBox.warning(self, "Clock", str(e))
+        self.set_open_entry(self.db.get_open_entry())
+        self.load_data()
+
+    def set_open_entry(self, entry):
+        self.clock_btn.setText("Clock Out" if entry is not None else "Clock In")
+        self.live_bar.set_entry(entry)
+
+    def update_live_label(self, hours):
+        # Week overtime and balance as if the open entry ended now: only today's overtime moves
+        week = self.shown_week
+        if self.view != "Week" or week is None or date.today() not in week.days:
+            return
+        recorded = self.live_base_hours
+        extra = max(recorded + hours - DAILY_NORM_HOURS, 0) - max(recorded - DAILY_NORM_HOURS, 0)
+        self.extra_hours_label.setText(f"Extra Hours: {round(week.extra_hours + extra, 2):g}    "
+                                       f"Balance: {round(week.balance + extra, 2):g}")
+
+    def update_undo_buttons(self):
+        self.undo_btn.setEnabled(self.db.can_undo())
+        self.redo_btn.setEnabled(self.db.can_redo())
+
+    def undo(self):
+        if self.db is not None and self.db.undo() is not None:
+            # Undoing a clock-in or clock-out closes or reopens the running entry
+            self.set_open_entry(self.db.get_open_entry())
+            self.load_data()
+
+    def redo(self):
+        if self.db is not None and self.db.redo() is not None:
+            self.set_open_entry(self.db.get_open_entry())
+            self.load_data()
+
     def previous_week(self):
-        self.week_spinbox.setValue(self.week_spinbox.value() - 1)
+        if self.view != "Week":
+            from weeks import view_range
+            self.range_anchor = view_range(self.view, self.range_anchor)[0] - timedelta(days=1)
+            self.load_range()
+            return
+        self.load_data(self.displayed_start - timedelta(days=7))
 
     def next_week(self):
-        self.week_spinbox.setValue(self.week_spinbox.value() + 1)
+        if self.view != "Week":
+            from weeks import view_range
+            self.range_anchor = view_range(self.view, self.range_anchor)[1] + timedelta(days=1)
+            self.load_range()
+            return
+        self.load_data(self.displayed_start + timedelta(days=7))
+
+    def view_changed(self, view):
+        self.view = view
+        if self.perf_overlay is not None:
+            self.perf_overlay.view = view
+        if view == "Week":
+            if self.range_ax is not None:
+                self.range_ax.set_visible(False)
+            self.ax.set_visible(True)
+            self.canvas.draw_idle()
+            self.load_data(self.displayed_start)
+            return
+        if self.range_ax is None:
+            from ui.range_plot import RangePlot
+            self.range_ax = self.figure.add_subplot()
+            self.range_plot = RangePlot(self.range_ax, self.time_breakpoints)
+        self.ax.set_visible(False)
+        self.range_ax.set_visible(True)
+        if self.range_anchor is None:
+            self.range_anchor = self.displayed_start or date.today()
+        self.load_range()
+
+    def load_range(self):
+        self.range_request = self.week_loader.request_range(self.view, self.range_anchor)
+
+    def on_range_loaded(self, request_id, data):
+        if not self.week_loader.is_current(request_id) or data.view != self.view:
+            return
+        with perf.span('range_plot.update'):
+            self.range_plot.update(data)
+        self.extra_hours_label.setText(f"Extra Hours: {data.totals.overtime.sum():g}    Balance: {data.balance:g}")
+        self.canvas.draw_idle()
 
     def week_changed(self, value):
         self.week_label.setText(f"Week {value}")
         self.update_displayed_week(value)
 
     def update_displayed_week(self, week_number):
-        year = date.today().year
-        start_date = date.fromisocalendar(year, week_number, 1)
-        self.db.set_setting("start_date", start_date.strftime("%Y-%m-%d"))
-        self.load_data()
-
-    def load_data(self):
-        start_date = self.db.get_setting("start_date")
-        if not start_date:
-            today = date.today()
-            start_date = today - timedelta(days=today.weekday())
-        else:
-            if isinstance(start_date, str):
-                start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-
-        end_date = start_date + timedelta(days=6)
-        
-        # Update week number display
+        # A week typed into the spinbox is taken from the ISO year on display
+        year = (self.displayed_start or date.today()).isocalendar()[0]
+        try:
+            start_date = date.fromisocalendar(year, week_number, 1)
+        except ValueError:  # Week 53 of a year with 52 weeks
+            start_date = date.fromisocalendar(year + 1, 1, 1)
+        self.load_data(start_date)
+
+    def load_data(self, start_date=None):
+        if start_date is None:
+            with perf.span('load_data.start_date'):
+                start_date = self.settings.get_date("start_date")
+                if start_date is None:
+                    today = date.today()
+                    start_date = today - timedelta(days=today.weekday())
+
+        # Update week number display; without signals, so syncing it does not navigate again
+        self.week_spinbox.blockSignals(True)
         self.week_spinbox.setValue(start_date.isocalendar()[1])
+        self.week_spinbox.blockSignals(False)
         self.week_label.setText(f"Week {self.week_spinbox.value()}")       
         
-        entries = self.db.get_entries(start_date, end_date)
-
-        # Process data
-        data = {}
-        for entry in entries:
-            date2 = entry[1]
-            entry_type = entry[4]
-            hours = entry[5]
-            lunch_break = entry[6]
-            if entry[2] and entry[3]:
-                check_in = datetime.strptime(entry[2], "%H:%M")
-                check_out = datetime.strptime(entry[3], "%H:%M")
-                start_time = check_in.hour + check_in.minute / 60
-                end_time = check_out.hour + check_out.minute / 60
-                data[date2] = data.get(date2, []) + [(start_time, end_time, entry_type, lunch_break)]
-            else:
-                data[date2] = data.get(date2, []) + [(8.0, 16.0, entry_type, lunch_break)]
-
-        # Ensure all days are present
-        dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-        
-        # Reorder dates to make Sunday the last day
-        if datetime.strptime(dates[0], "%Y-%m-%d").weekday() == 6:  # If the first day is Sunday
-            dates = dates[1:] + [dates[0]]
-
-        # Calculate extra hours
-        total_extra = 0
-        for day in data:
-            for period in data[day]:
-                hours = period[1] - period[0]
-                if hours > 7.5:
-                    total_extra += (hours - 7.5)
-        self.extra_hours_label.setText(f"Extra Hours: {total_extra}")
-
-        # Plot data
-        self.ax.clear()
-        self.ax.set_yscale('custom_time')
-        self.ax.set_ylim(24, 0)  # Reverse y-axis so 0 at top
-        self.ax.set_xlim(-0.5, len(dates) - 0.5)
-
-        x_positions = np.arange(len(dates))
-
-        # Plot each work period as a vertical bar
-        for i, day in enumerate(dates):
-            if day in data:
-                periods = data[day]
-                for period in periods:
-                    start, end, entry_type, lunch_break = period
-                    color = 'skyblue' if entry_type == 'Working' else 'green' if entry_type == 'Vacation' else 'yellow'
-                    self.ax.bar(
-                        i,
-                        end - start,
-                        bottom=start,
-                        width=0.6,
-                        color=color,
-                        edgecolor='black'
-                    )
-                    # Add white dot for lunch break
-                    if lunch_break:
-                        mid_time = (start + end) / 2
-                        self.ax.scatter(i, mid_time, color='white', s=70, zorder=3, edgecolors='black')
-        
-        # Add vertical lines to separate days
-        for i in range(1, len(dates)):
-            self.ax.axvline(x=i-0.5, color='gray', linestyle='--', alpha=0.5)
-
-        self.ax.set_xticks(x_positions)
-        self.ax.set_xticklabels([
-            f"{datetime.strptime(d, '%Y-%m-%d').strftime('%A')}\n{datetime.strptime(d, '%Y-%m-%d').strftime('%d.%m.%Y')}"
-            for d in dates
-        ])
-        # Bottom margin:
-        self.figure.subplots_adjust(bottom=0.2)
-
-        #self.ax.set_xlabel("Day of Week")
-        #self.ax.set_ylabel("Time of Day")
-        #self.ax.set_title("Weekly Work Schedule")
-
-        self.figure.tight_layout()
-        self.canvas.draw()
+        self.displayed_start = start_date
+        # Navigation state: kept in memory and written back on close
+        self.settings.set_date("start_date", start_date, persist=False)
+        if self.view != "Week":
+            # Writes made from a range view refresh that view; the week is loaded on return
+            self.load_range()
+            return
+        week = self.week_cache.peek(start_date)
+        if week is not None:
+            self.show_week(week)
+        else:
+            # Loaded on the worker pool; show_week runs when week_loaded arrives
+            self.request_versions[self.week_loader.request(start_date)] = self.week_cache.version
+
+    def show_week(self, week):
+        self.extra_hours_label.setText(f"Extra Hours: {week.extra_hours:g}    Balance: {week.balance:g}")
+        self.shown_week = week
+        if self.live_bar.entry is not None and date.today() in week.days:
+            today = self.db.get_daily_totals(date.today(), date.today())
+            self.live_base_hours = today[0][1] + today[0][2] if today else 0.0
+        self.live_bar.set_days(week.days)
+
+        # Only the day columns that changed are rebuilt; draw_idle coalesces repaints
+        with perf.span('show_week.plot'):
+            changed = self.week_plot.update(week)
+        if changed:
+            if not self._layout_done:
+                with perf.span('show_week.tight_layout'):
+                    self.figure.tight_layout()
+                self._layout_done = True
+            self.canvas.draw_idle()
+
+        # Warm the cache with the neighbouring weeks in the background
+        for offset in (-7, 7):
+            neighbour = week.start_date + timedelta(days=offset)
+            if neighbour not in self.week_cache:
+                self.request_versions[self.week_loader.prefetch(neighbour)] = self.week_cache.version
+
+    def on_week_loaded(self, request_id, week):
+        # Results are cached only if no write happened since the request was made
+        if not self.week_cache.put(week, self.request_versions.pop(request_id, -1)):
+            # The database changed while this week was loading
+            if week.start_date == self.displayed_start and self.week_loader.is_current(request_id):
+                self.load_data(self.displayed_start)
+            return
+        if week.start_date == self.displayed_start and self.week_loader.is_current(request_id):
+            self.show_week(week)
+
+    def on_week_cancelled(self, request_id):
+        self.request_versions.pop(request_id, None)
+
+    def on_week_failed(self, request_id, message):
+        self.request_versions.pop(request_id, None)
+        if self.week_loader.is_current(request_id):
+            QMessageBox.warning(self, "Load Failed", f"Could not load the week: {message}")
+
+    def showEvent(self, event):
+        super(MainWindow, self).showEvent(event)
+        self.update_live_activity()
+
+    def hideEvent(self, event):
+        super(MainWindow, self).hideEvent(event)
+        self.update_live_activity()
+
+    def changeEvent(self, event):
+        super(MainWindow, self).changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.update_live_activity()
+
+    def update_live_activity(self):
+        # The live bar ticks only while someone can see it
+        if self.db is not None:
+            self.live_bar.set_active(self.isVisible() and not self.isMinimized())
 
     def closeEvent(self, event):
-        self.db.close()
+        if self.db is not None:
+            self.live_bar.stop()
+            self.week_loader.shutdown()
+            self.settings_timer.stop()
+            self.settings.close()
+            self.db.close()
+        if perf.enabled:
+            perf_logger.info("Timing summary:\n%s", perf.summary())
         event.accept()
 
-def main():
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
+def main(profiler=None, user_id=DEFAULT_USER):
+    profiler = profiler or StartupProfiler()
+    with profiler.phase("QApplication"):
+        app = QApplication(sys.argv)
+    with profiler.phase("window shell"):
+        window = MainWindow(profiler, user_id)
+        window.show()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
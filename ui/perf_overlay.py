@@ -0,0 +1,42 @@
+# ui/perf_overlay.py
+from PyQt5.QtWidgets import QLabel
+from PyQt5.QtCore import Qt
+from instrumentation import perf
+
+# Phases of one displayed week/range, in the order they run. The load_* phases run on the
+# worker pool and are skipped on cache hits, so their figures may be from an earlier load.
+WEEK_PHASES = [
+    'load_data', 'load_data.start_date', 'load_week.query', 'load_week.periods',
+    'load_week.balance', 'show_week.plot', 'show_week.tight_layout', 'canvas.draw',
+]
+RANGE_PHASES = [
+    'load_data', 'load_range_view.query', 'load_range_view.matrix', 'load_range_view.balance',
+    'range_plot.update', 'canvas.draw',
+]
+
+class PerfOverlay(QLabel):
+    # Debug overlay in the corner of the canvas with the last render's phase breakdown (--perf, F12)
+
+    def __init__(self, parent):
+        super(PerfOverlay, self).__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 170); color: white; "
+            "font-family: monospace; font-size: 11px; padding: 6px;"
+        )
+        self.move(8, 8)
+        self.view = "Week"
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        phases = WEEK_PHASES if self.view == "Week" else RANGE_PHASES
+        lines = [f"{self.view} render (ms)"]
+        for name, seconds in perf.last(phases):
+            lines.append(f"{name:<26} {'-' if seconds is None else f'{seconds * 1000:8.2f}':>8}")
+        lines.append("slowest SQL (total ms)")
+        for name, stats in perf.top('sql: '):
+            lines.append(f"{stats.total * 1000:8.1f}  {name[5:53]}")
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        self.raise_()
@@ -0,0 +1,62 @@
+# ui/range_plot.py
+from datetime import date, timedelta
+import numpy as np
+from matplotlib.colors import BoundaryNorm, ListedColormap
+from ui.time_scale import DEFAULT_BREAKPOINTS
+from ui.week_plot import type_color
+
+# Colours by weeks.TYPE_CODES value; code 0 is an empty slot
+CMAP = ListedColormap(['white', type_color('Working'), type_color('Vacation'), type_color('Sick Leave')])
+NORM = BoundaryNorm([-0.5, 0.5, 1.5, 2.5, 3.5], CMAP.N)
+
+class RangePlot:
+    # Month/quarter/year view: days on x, time of day on the custom time scale on y.
+    # The whole range is one pre-binned matrix drawn by a single pcolormesh.
+
+    def __init__(self, ax, breakpoints=DEFAULT_BREAKPOINTS):
+        self.ax = ax
+        self.data = None
+        self._mesh = None
+        ax.set_yscale('custom_time', breakpoints=breakpoints)
+
+    def update(self, data):
+        self.data = data
+        n_bins, n_days = data.matrix.shape
+        if self._mesh is not None and self._mesh.get_array().shape == data.matrix.shape:
+            self._mesh.set_array(data.matrix)
+        else:
+            if self._mesh is not None:
+                self._mesh.remove()
+            x_edges = np.arange(n_days + 1) - 0.5
+            y_edges = np.linspace(0, 24, n_bins + 1)
+            self._mesh = self.ax.pcolormesh(x_edges, y_edges, data.matrix, cmap=CMAP, norm=NORM)
+            self.ax.set_xlim(-0.5, n_days - 0.5)
+            self.ax.set_ylim(24, 0)  # Reverse y-axis so 0 at top
+
+        positions, labels = self._ticks(data)
+        self.ax.set_xticks(positions)
+        self.ax.set_xticklabels(labels)
+        worked = data.totals.worked.sum() + data.totals.leave.sum()
+        # Shown below the axis, where the week view keeps its two-line day labels
+        self.ax.set_xlabel(f"{self._title(data)}: {worked:g} h recorded")
+
+    def _ticks(self, data):
+        if data.view == 'Month':
+            # Every Monday of the month
+            days = [data.start_date + timedelta(days=i) for i in range((data.end_date - data.start_date).days + 1)]
+            ticks = [(i, d.strftime('%a %d')) for i, d in enumerate(days) if d.weekday() == 0]
+        else:
+            # First day of every month
+            ticks = []
+            month = data.start_date
+            while month <= data.end_date:
+                ticks.append(((month - data.start_date).days, month.strftime('%b')))
+                month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        return [t[0] for t in ticks], [t[1] for t in ticks]
+
+    def _title(self, data):
+        if data.view == 'Month':
+            return data.start_date.strftime('%B %Y')
+        if data.view == 'Quarter':
+            return f"Q{(data.start_date.month - 1) // 3 + 1} {data.start_date.year}"
+        return str(data.start_date.year)
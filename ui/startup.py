@@ -0,0 +1,33 @@
+# ui/startup.py
+import sys
+import time
+from contextlib import contextmanager
+
+class StartupProfiler:
+    # Collects per-phase wall-clock timings of application startup (--profile-startup)
+
+    def __init__(self, enabled=False, stream=None):
+        self.enabled = enabled
+        self.stream = stream or sys.stderr
+        self.started = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        total = time.perf_counter() - self.started
+        print("Startup profile:", file=self.stream)
+        for name, seconds in self.phases:
+            print(f"  {name:<28} {seconds * 1000:8.1f} ms", file=self.stream)
+        print(f"  {'total until first paint':<28} {total * 1000:8.1f} ms", file=self.stream)
@@ -0,0 +1,105 @@
+# ui/time_scale.py
+import numpy as np
+from matplotlib.scale import ScaleBase
+from matplotlib.transforms import Transform
+from matplotlib.ticker import FixedLocator, FixedFormatter
+from matplotlib import scale as mscale
+
+# (hour, scale): from that hour on, one hour of the day takes `scale` units of axis length.
+# The default compresses the night and stretches 07:00-18:00.
+DEFAULT_BREAKPOINTS = ((0, 0.2), (7, 0.6), (18, 0.2))
+
+# Positions beyond the day are extrapolated with the slope of the first/last zone; np.interp
+# clamps, so the table gets an extra point this many hours past each end
+_EXTEND = 1e6
+
+def breakpoint_table(breakpoints):
+    # Hours and axis positions of the zone boundaries, both increasing, covering 00:00-24:00
+    breakpoints = sorted(breakpoints)
+    if not breakpoints or breakpoints[0][0] != 0:
+        raise ValueError("Time scale breakpoints must start at hour 0")
+    if any(scale <= 0 for _, scale in breakpoints):
+        raise ValueError("Time scale factors must be positive")
+    hours = [hour for hour, _ in breakpoints] + [24]
+    scales = [scale for _, scale in breakpoints]
+    if any(b <= a for a, b in zip(hours, hours[1:])):
+        raise ValueError("Time scale breakpoints must be distinct hours below 24")
+    positions = np.concatenate([[0.0], np.cumsum(np.diff(hours) * np.array(scales))])
+    hours = np.array(hours, dtype=float)
+    # Linear extension past both ends
+    hours = np.concatenate([[hours[0] - _EXTEND], hours, [hours[-1] + _EXTEND]])
+    positions = np.concatenate([[positions[0] - _EXTEND * scales[0]], positions,
+                                [positions[-1] + _EXTEND * scales[-1]]])
+    return hours, positions
+
+def core_hours(start, end, core=0.6, compressed=0.2):
+    # Breakpoints stretching [start, end) and compressing the rest; end < start wraps past
+    # midnight, e.g. core_hours(22, 6) for a night shift
+    if start == end:
+        return ((0, core),)
+    if start < end:
+        zones = [(0, compressed), (start, core), (end, compressed)]
+    else:
+        zones = [(0, core), (end, compressed), (start, core)]
+    # A zone that starts where the next one does, as with start 0, is empty
+    return tuple(zone for zone, following in zip(zones, zones[1:] + [(24, None)])
+                 if zone[0] < following[0])
+
+def parse_breakpoints(text):
+    # "0:0.2,7:0.6,18:0.2" -> ((0, 0.2), (7, 0.6), (18, 0.2)); None for an empty setting
+    if not text:
+        return None
+    pairs = []
+    for part in text.split(','):
+        hour, scale = part.split(':')
+        pairs.append((float(hour), float(scale)))
+    breakpoint_table(pairs)  # Validates
+    return tuple(pairs)
+
+def format_breakpoints(breakpoints):
+    # The inverse of parse_breakpoints: ((0, 0.2), (7, 0.6)) -> "0:0.2,7:0.6"
+    return ','.join(f"{hour:g}:{scale:g}" for hour, scale in breakpoints)
+
+class PiecewiseTimeTransform(Transform):
+    # Maps through a monotonic piecewise-linear table with one np.interp call. Instances are
+    # immutable and created once per scale; the inverse swaps the table and is built once.
+    input_dims = output_dims = 1
+    is_separable = True
+    has_inverse = True
+
+    def __init__(self, source, target, inverse=None):
+        super().__init__()
+        self.source = source
+        self.target = target
+        self._inverse = inverse
+
+    def transform_non_affine(self, values):
+        return np.interp(values, self.source, self.target)
+
+    def inverted(self):
+        if self._inverse is None:
+            self._inverse = PiecewiseTimeTransform(self.target, self.source, inverse=self)
+        return self._inverse
+
+class CustomTimeScale(ScaleBase):
+    # Time of day in hours on a piecewise-linear axis; set_yscale('custom_time', breakpoints=...)
+    name = 'custom_time'
+
+    def __init__(self, axis, breakpoints=DEFAULT_BREAKPOINTS, **kwargs):
+        super().__init__(axis, **kwargs)
+        self.axis = axis
+        self.breakpoints = tuple(breakpoints)
+        self._transform = PiecewiseTimeTransform(*breakpoint_table(self.breakpoints))
+
+    def get_transform(self):
+        return self._transform
+
+    def set_default_locators_and_formatters(self, axis):
+        major_times = np.arange(0, 25, 2)
+        axis.set_major_locator(FixedLocator(major_times))
+        axis.set_major_formatter(FixedFormatter([f"{int(t):02d}:00" for t in major_times]))
+
+def register():
+    # Register the custom scale; called once the plotting stack is actually needed
+    if CustomTimeScale.name not in mscale.get_scale_names():
+        mscale.register_scale(CustomTimeScale)
@@ -0,0 +1,85 @@
+# ui/week_plot.py
+from bisect import bisect_right
+import numpy as np
+from matplotlib.collections import PolyCollection
+from ui.time_scale import DEFAULT_BREAKPOINTS
+
+BAR_WIDTH = 0.6
+
+def type_color(entry_type):
+    return 'skyblue' if entry_type == 'Working' else 'green' if entry_type == 'Vacation' else 'yellow'
+
+class WeekPlot:
+    # Persistent artists for the seven-day chart: one PolyCollection of bars per day column
+    # and a single scatter for the lunch markers. update() only rebuilds the columns whose
+    # periods changed, so the caller can follow it with a cheap canvas.draw_idle().
+
+    def __init__(self, ax, n_days=7, breakpoints=DEFAULT_BREAKPOINTS):
+        self.ax = ax
+        self.n_days = n_days
+        self.week = None
+
+        ax.set_yscale('custom_time', breakpoints=breakpoints)
+        self._columns = []
+        for i in range(n_days):
+            collection = PolyCollection([], edgecolors='black')
+            ax.add_collection(collection, autolim=False)
+            self._columns.append(collection)
+        self._lunch = ax.scatter([], [], color='white', s=70, zorder=3, edgecolors='black')
+        self._periods = [None] * n_days
+        # Hit-test index: per column, period start minutes sorted for bisect lookup
+        self._starts = [[] for _ in range(n_days)]
+        self._labels = None
+
+        ax.set_ylim(24, 0)  # Reverse y-axis so 0 at top
+        ax.set_xlim(-0.5, n_days - 0.5)
+        # Add vertical lines to separate days
+        for i in range(1, n_days):
+            ax.axvline(x=i-0.5, color='gray', linestyle='--', alpha=0.5)
+        ax.set_xticks(np.arange(n_days))
+
+    def update(self, week):
+        # Returns True when anything visible changed and the canvas needs a redraw
+        self.week = week
+        changed = False
+
+        labels = [f"{d.strftime('%A')}\n{d.strftime('%d.%m.%Y')}" for d in week.days]
+        if labels != self._labels:
+            self.ax.set_xticklabels(labels)
+            self._labels = labels
+            changed = True
+
+        for i, day in enumerate(week.days):
+            periods = tuple(sorted(week.periods.get(day.toordinal(), ()), key=lambda period: period.start))
+            if periods != self._periods[i]:
+                self._set_column(i, periods)
+                changed = True
+
+        if changed:
+            lunch = [(i, (period.start + period.end) / 120)
+                     for i, periods in enumerate(self._periods)
+                     for period in periods if period.lunch_break]
+            self._lunch.set_offsets(np.array(lunch, dtype=float).reshape(-1, 2))
+        return changed
+
+    def _set_column(self, i, periods):
+        left, right = i - BAR_WIDTH / 2, i + BAR_WIDTH / 2
+        self._columns[i].set_verts([
+            [(left, period.start / 60), (right, period.start / 60),
+             (right, period.end / 60), (left, period.end / 60)]
+            for period in periods
+        ])
+        self._columns[i].set_facecolor([type_color(period.type) for period in periods])
+        self._periods[i] = periods
+        self._starts[i] = [period.start for period in periods]
+
+    def hit_test(self, x, y):
+        # Returns (day_index, period) of the bar under the data coordinates (y in hours), or None
+        day_index = int(round(x))
+        if not 0 <= day_index < self.n_days or abs(x - day_index) > BAR_WIDTH / 2:
+            return None
+        minute = y * 60
+        i = bisect_right(self._starts[day_index], minute) - 1
+        if i >= 0 and minute <= self._periods[day_index][i].end:
+            return day_index, self._periods[day_index][i]
+        return None
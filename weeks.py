@@ -0,0 +1,193 @@
+# weeks.py
+from collections import OrderedDict, namedtuple
+from datetime import date, timedelta
+import numpy as np
+from database import DAILY_NORM_HOURS
+from instrumentation import perf
+
+# Column layout of Database.get_entry_rows; times are minutes since midnight, -1 when missing
+ENTRY_DTYPE = np.dtype([
+    ('id', 'i8'), ('date', 'i8'), ('check_in', 'i4'), ('check_out', 'i4'),
+    ('type', 'U16'), ('hours', 'f8'), ('lunch_break', '?'),
+])
+
+# Entries without times are shown as a default 08:00-16:00 bar
+DEFAULT_START, DEFAULT_END = 8 * 60, 16 * 60
+
+# One bar of the chart; start/end are minutes since midnight and id is the work_entries row
+Period = namedtuple('Period', ['id', 'start', 'end', 'type', 'lunch_break'])
+
+# Processed data of one displayed week.
+# days: the seven dates in display order (Sunday last)
+# periods: day ordinal -> list of Period
+WeekData = namedtuple('WeekData', ['start_date', 'days', 'periods', 'extra_hours', 'balance'])
+
+# Per-day sums over a date range; arrays are indexed by day offset from first_day (an ordinal)
+DayTotals = namedtuple('DayTotals', ['first_day', 'worked', 'leave', 'overtime'])
+
+# Processed data of a month/quarter/year view.
+# matrix: (time bins x days) type codes from TYPE_CODES, 0 where nothing is recorded
+RangeData = namedtuple('RangeData', ['view', 'start_date', 'end_date', 'matrix', 'totals', 'balance'])
+
+# Colour index of each entry type in range views; anything else is shown as code 3
+TYPE_CODES = {'Working': 1, 'Vacation': 2, 'Sick Leave': 3}
+
+RANGE_VIEWS = ('Month', 'Quarter', 'Year')
+
+def week_key(start_date):
+    year, week, _ = start_date.isocalendar()
+    return year, week
+
+def load_entries(db, start_date, end_date):
+    # Query result straight into a structured array, no per-row Python objects
+    return np.fromiter(db.get_entry_rows(start_date, end_date), dtype=ENTRY_DTYPE)
+
+def bar_minutes(entries):
+    # Start/end minutes of each entry's bar, substituting the default bar for untimed entries
+    timed = (entries['check_in'] >= 0) & (entries['check_out'] >= 0)
+    return (np.where(timed, entries['check_in'], DEFAULT_START),
+            np.where(timed, entries['check_out'], DEFAULT_END))
+
+def day_totals(entries, first_day, n_days):
+    # Same rules as the daily_totals table: overtime is per day, above DAILY_NORM_HOURS
+    offsets = entries['date'] - first_day
+    working = entries['type'] == 'Working'
+    worked = np.bincount(offsets, weights=np.where(working, entries['hours'], 0.0), minlength=n_days)
+    leave = np.bincount(offsets, weights=np.where(working, 0.0, entries['hours']), minlength=n_days)
+    overtime = np.maximum(worked + leave - DAILY_NORM_HOURS, 0.0)
+    return DayTotals(first_day, worked, leave, overtime)
+
+def load_range(db, start_date, end_date):
+    # Entries plus per-day totals for any range: a week, a year or the whole history. A running
+    # clock-in (check_in without check_out) is left out; the UI draws it live.
+    entries = load_entries(db, start_date, end_date)
+    entries = entries[~((entries['check_in'] >= 0) & (entries['check_out'] < 0))]
+    first_day = start_date.toordinal()
+    return entries, day_totals(entries, first_day, end_date.toordinal() - first_day + 1)
+
+def view_range(view, anchor):
+    # First and last date of the month/quarter/year containing anchor
+    if view == 'Month':
+        first_month, months = anchor.month, 1
+    elif view == 'Quarter':
+        first_month, months = 3 * ((anchor.month - 1) // 3) + 1, 3
+    elif view == 'Year':
+        first_month, months = 1, 12
+    else:
+        raise ValueError(f"Unknown view: {view}")
+    start = date(anchor.year, first_month, 1)
+    next_month = first_month + months
+    end = date(anchor.year + (next_month - 1) // 12, (next_month - 1) % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+def time_of_day_matrix(entries, first_day, n_days, bin_minutes=15):
+    # Bins every day into time-of-day slots in one pass per entry type: a +1/-1 difference
+    # array at each bar's start/end bin, cumulated along the day
+    n_bins = 24 * 60 // bin_minutes
+    matrix = np.zeros((n_bins, n_days), dtype=np.int8)
+    starts, ends = bar_minutes(entries)
+    start_bins = starts // bin_minutes
+    end_bins = np.minimum(-(-ends // bin_minutes), n_bins)
+    offsets = entries['date'] - first_day
+    types, inverse = np.unique(entries['type'], return_inverse=True)
+    type_codes = np.array([TYPE_CODES.get(t, 3) for t in types], dtype=np.int8)[inverse]
+    for code in np.unique(type_codes):
+        mask = type_codes == code
+        diff = np.zeros((n_days, n_bins + 1), dtype=np.int32)
+        np.add.at(diff, (offsets[mask], start_bins[mask]), 1)
+        np.add.at(diff, (offsets[mask], end_bins[mask]), -1)
+        matrix[np.cumsum(diff, axis=1)[:, :n_bins].T > 0] = code
+    return matrix
+
+def load_range_view(db, view, anchor, bin_minutes=15):
+    start_date, end_date = view_range(view, anchor)
+    with perf.span('load_range_view.query'):
+        entries, totals = load_range(db, start_date, end_date)
+    with perf.span('load_range_view.matrix'):
+        matrix = time_of_day_matrix(entries, totals.first_day, len(totals.worked), bin_minutes)
+    with perf.span('load_range_view.balance'):
+        balance = db.get_balance(None, end_date)
+    return RangeData(view, start_date, end_date, matrix, totals, balance)
+
+def load_week(db, start_date):
+    end_date = start_date + timedelta(days=6)
+    with perf.span('load_week.query'):
+        entries, totals = load_range(db, start_date, end_date)
+
+    with perf.span('load_week.periods'):
+        starts, ends = bar_minutes(entries)
+        periods = {}
+        for period in zip(entries['date'].tolist(), entries['id'].tolist(), starts.tolist(), ends.tolist(),
+                          entries['type'].tolist(), entries['lunch_break'].tolist()):
+            periods.setdefault(period[0], []).append(Period(*period[1:]))
+
+    days = [start_date + timedelta(days=i) for i in range(7)]
+    # Reorder dates to make Sunday the last day
+    if days[0].weekday() == 6:
+        days = days[1:] + [days[0]]
+
+    # The running balance comes from the maintained daily_totals aggregates
+    extra_hours = float(totals.overtime.sum())
+    with perf.span('load_week.balance'):
+        balance = db.get_balance(None, end_date)
+    return WeekData(start_date, days, periods, extra_hours, balance)
+
+class WeekCache:
+    # LRU cache of WeekData keyed by ISO (year, week), invalidated by database writes
+
+    def __init__(self, db, maxsize=16):
+        self.db = db
+        self.maxsize = maxsize
+        self._weeks = OrderedDict()
+        # Bumped on every invalidation so results loaded elsewhere can be checked for staleness
+        self.version = 0
+        db.add_listener(self.invalidate)
+
+    def __contains__(self, start_date):
+        week = self._weeks.get(week_key(start_date))
+        return week is not None and week.start_date == start_date
+
+    def get(self, start_date):
+        week = self.peek(start_date)
+        if week is not None:
+            return week
+        week = load_week(self.db, start_date)
+        self.put(week)
+        return week
+
+    def peek(self, start_date):
+        # Cached week or None, without loading
+        week = self._weeks.get(week_key(start_date))
+        if week is not None and week.start_date == start_date:
+            self._weeks.move_to_end(week_key(start_date))
+            return week
+        return None
+
+    def put(self, week, version=None):
+        # version: the cache version the week was loaded under; stale loads are dropped
+        if version is not None and version != self.version:
+            return False
+        key = week_key(week.start_date)
+        self._weeks[key] = week
+        self._weeks.move_to_end(key)
+        while len(self._weeks) > self.maxsize:
+            self._weeks.popitem(last=False)
+        return True
+
+    def prefetch(self, start_date):
+        if start_date not in self:
+            self.put(load_week(self.db, start_date))
+
+    def invalidate(self, dates=None):
+        # A change on a day affects that week's data and the running balance of every later week
+        self.version += 1
+        if dates is None:
+            self._weeks.clear()
+            return
+        first = min(dates)
+        for key, week in list(self._weeks.items()):
+            if week.start_date.toordinal() + 6 >= first:
+                del self._weeks[key]
+
+    def close(self):
+        self.db.remove_listener(self.invalidate)